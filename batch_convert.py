@@ -0,0 +1,211 @@
+"""Headless batch converter: stream prompts through the rule-based POML converter.
+
+Reads JSONL records or plain-text prompts (one per line) as a stream, converts
+them with convert_to_poml on a process pool and writes one JSONL result per
+input record, in input order. Only a bounded window of chunks is in flight,
+so multi-GB inputs never sit in memory. Works fully offline.
+
+    python batch_convert.py prompts.jsonl -o converted.jsonl --field body --id-field request_id
+    cat prompts.txt | python batch_convert.py - --format text --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from poml_template import iter_chunks, map_chunks
+
+DEFAULT_TEXT_FIELDS = ('prompt', 'text', 'plain_text', 'body')
+RESERVOIR_SIZE = 10_000
+
+
+def read_records(stream, input_format, field=None, id_field=None):
+    """Yield (record id, prompt text or None, error or None) for each input line"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        if input_format == 'text':
+            if line.strip():
+                yield line_number, line, None
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(record, str):
+            yield line_number, record, None
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Record is neither an object nor a string"
+            continue
+        record_id = record.get(id_field, line_number) if id_field else line_number
+        fields = [field] if field else DEFAULT_TEXT_FIELDS
+        text = next((record[name] for name in fields if isinstance(record.get(name), str)), None)
+        if text is None:
+            yield record_id, None, f"No text field found (tried: {', '.join(fields)})"
+        else:
+            yield record_id, text, None
+
+
+# Per-process converter state, set once by the pool initializer
+_convert = None
+_settings = None
+
+
+def _init_worker(settings):
+    global _convert, _settings
+    from poml_core import convert_to_poml
+    _convert = convert_to_poml
+    _settings = settings
+
+
+def convert_chunk(chunk):
+    """Convert a chunk of (id, text, error) records; returns result dicts with latency"""
+    results = []
+    for record_id, text, error in chunk:
+        if error is not None:
+            results.append({'id': record_id, 'error': error})
+            continue
+        start = time.perf_counter()
+        try:
+            poml = _convert(text, _settings)
+        except Exception as e:
+            results.append({'id': record_id, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        results.append({'id': record_id, 'poml': poml,
+                        'latency_ms': round((time.perf_counter() - start) * 1000, 3)})
+    return results
+
+
+def convert_stream(records, settings, workers=1, chunksize=64):
+    """Yield result dicts in input order; at most two chunks per worker are in flight"""
+    if workers <= 1:
+        _init_worker(settings)
+        for chunk in iter_chunks(records, chunksize):
+            yield from convert_chunk(chunk)
+        return
+
+    for results in map_chunks(convert_chunk, records, chunksize, workers, _init_worker, (settings,)):
+        yield from results
+
+
+class LatencyStats:
+    """Throughput and latency percentiles with constant memory (reservoir sample)"""
+
+    def __init__(self, reservoir_size=RESERVOIR_SIZE):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.reservoir = []
+        self.reservoir_size = reservoir_size
+        self.rng = random.Random(0)
+        self.started = time.perf_counter()
+
+    def add(self, result):
+        self.count += 1
+        if 'error' in result:
+            self.errors += 1
+            return
+        latency = result['latency_ms']
+        self.total_ms += latency
+        self.max_ms = max(self.max_ms, latency)
+        converted = self.count - self.errors
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(latency)
+        else:
+            slot = self.rng.randrange(converted)
+            if slot < self.reservoir_size:
+                self.reservoir[slot] = latency
+
+    def percentile(self, fraction):
+        if not self.reservoir:
+            return 0.0
+        ordered = sorted(self.reservoir)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        converted = self.count - self.errors
+        return {
+            'records': self.count,
+            'errors': self.errors,
+            'elapsed_s': round(elapsed, 3),
+            'records_per_s': round(self.count / elapsed, 1) if elapsed else 0.0,
+            'latency_mean_ms': round(self.total_ms / converted, 3) if converted else 0.0,
+            'latency_p50_ms': round(self.percentile(0.50), 3),
+            'latency_p95_ms': round(self.percentile(0.95), 3),
+            'latency_p99_ms': round(self.percentile(0.99), 3),
+            'latency_max_ms': round(self.max_ms, 3)
+        }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert plain-text prompts to POML in bulk (offline, rule-based).")
+    parser.add_argument('input', help="Input file, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="Output JSONL file (default: stdout)")
+    parser.add_argument('--format', choices=['jsonl', 'text'], help="Input format (default: from file extension)")
+    parser.add_argument('--field', help="JSON field holding the prompt (default: first of %s)" % ', '.join(DEFAULT_TEXT_FIELDS))
+    parser.add_argument('--id-field', help="JSON field to use as the record id (default: line number)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=64, help="Records per worker task")
+    parser.add_argument('--stats-every', type=int, default=0, help="Print progress stats to stderr every N records")
+
+    settings = parser.add_argument_group('conversion settings')
+    settings.add_argument('--no-examples', action='store_true', help="Do not extract examples")
+    settings.add_argument('--no-constraints', action='store_true', help="Do not extract constraints")
+    settings.add_argument('--no-structured-output', action='store_true', help="Do not add an output format")
+    settings.add_argument('--technical-focus', action='store_true', help="Emphasize technical depth")
+    settings.add_argument('--role-enhancement', default='Expert level',
+                          choices=['Auto-detect', 'Expert level', 'Professional', 'Specialist', 'Consultant'])
+    settings.add_argument('--constraint-grouping', default='List format',
+                          choices=['List format', 'Categorized', 'Prioritized', 'Nested'])
+    settings.add_argument('--output-sections', default='', help="Comma-separated output sections (default: by domain)")
+    settings.add_argument('--max-constraints', type=int, default=6, help="Constraints kept per prompt (0 for unlimited)")
+    return parser
+
+
+def settings_from_args(args):
+    return {
+        'include_examples': not args.no_examples,
+        'detailed_constraints': not args.no_constraints,
+        'structured_output': not args.no_structured_output,
+        'technical_focus': args.technical_focus,
+        'role_enhancement': args.role_enhancement,
+        'constraint_grouping': args.constraint_grouping,
+        'output_sections': [s.strip() for s in args.output_sections.split(',') if s.strip()],
+        'max_constraints': args.max_constraints or None
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    input_format = args.format or ('text' if args.input.endswith('.txt') else 'jsonl')
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    stats = LatencyStats()
+    try:
+        records = read_records(source, input_format, args.field, args.id_field)
+        for result in convert_stream(records, settings_from_args(args), args.workers, args.chunksize):
+            sink.write(json.dumps(result, ensure_ascii=False) + '\n')
+            stats.add(result)
+            if args.stats_every and stats.count % args.stats_every == 0:
+                print(json.dumps(stats.summary()), file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(json.dumps(stats.summary()), file=sys.stderr)
+    return 1 if stats.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
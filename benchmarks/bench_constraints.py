@@ -0,0 +1,84 @@
+"""Benchmark: ConstraintIndex near-duplicate detection vs the legacy pairwise scan.
+
+Run from the repository root:
+    python benchmarks/bench_constraints.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constraint_index import ConstraintIndex
+
+KEY_PHRASES = ['connected subgraph', 'adjacent red vertices', 'blue vertices', 'total weight']
+BASE_WORDS = ('vertex edge weight color cover subgraph connected cost node tree path cycle '
+              'degree bound minimal maximal sorted unique integer prime modulus query update').split()
+# Spec vocabulary: base words plus numbered identifiers (limits, field names, ...)
+VOCABULARY = BASE_WORDS + [f'{word}_{i}' for word in BASE_WORDS for i in range(20)]
+
+
+def legacy_is_duplicate(new_constraint, existing_constraints):
+    """The O(n) per-insert check the converter used before the index"""
+    if not new_constraint:
+        return True
+    new_lower = new_constraint.lower()
+    for existing in existing_constraints:
+        existing_lower = existing.lower()
+        if new_lower == existing_lower:
+            return True
+        new_words = set(new_lower.split())
+        existing_words = set(existing_lower.split())
+        if len(new_words & existing_words) / max(len(new_words), len(existing_words)) > 0.8:
+            return True
+        for phrase in KEY_PHRASES:
+            if phrase in new_lower and phrase in existing_lower:
+                if abs(len(new_constraint) - len(existing)) < 20:
+                    return True
+    return False
+
+
+def make_clauses(count, seed=0):
+    """Spec-style clauses; roughly a third are reworded copies of earlier ones"""
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(count):
+        if clauses and rng.random() < 0.35:
+            words = rng.choice(clauses).split()
+            words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+            clauses.append(' '.join(words))
+        else:
+            clauses.append('Must keep ' + ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 14))))
+    return clauses
+
+
+def legacy_dedupe(clauses):
+    kept = []
+    for clause in clauses:
+        if not legacy_is_duplicate(clause, kept):
+            kept.append(clause)
+    return kept
+
+
+def index_dedupe(clauses):
+    index = ConstraintIndex(key_phrases=KEY_PHRASES)
+    return [clause for clause in clauses if index.add(clause)]
+
+
+def main():
+    print(f"{'clauses':>8} {'legacy ms':>10} {'index ms':>10} {'kept':>6} {'same':>5}")
+    for count in (100, 1_000, 5_000):
+        clauses = make_clauses(count)
+        start = time.perf_counter()
+        expected = legacy_dedupe(clauses)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        kept = index_dedupe(clauses)
+        indexed = time.perf_counter() - start
+        print(f"{count:>8} {legacy * 1000:>10.1f} {indexed * 1000:>10.1f} {len(kept):>6} {str(kept == expected):>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Benchmark: rule-based convert_to_poml latency on long prompts.
+
+Run from the repository root:
+    python benchmarks/bench_converter.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_core import convert_to_poml, get_olympiad_challenges
+
+SETTINGS = {
+    'include_examples': True,
+    'detailed_constraints': True,
+    'structured_output': True,
+    'role_enhancement': 'Expert level',
+    'output_sections': []
+}
+SIZES = [1_000, 10_000, 100_000]
+
+
+def build_prompt(target_chars):
+    """Concatenate the Olympiad plain-text prompts until the target length"""
+    corpus = ' '.join(challenge['plain_text'] for challenge in get_olympiad_challenges().values())
+    corpus += (' Note that the answer must be exact. For example, consider the case where n equals 3. '
+               'Please explain every step.')
+    return (corpus + ' ') * (target_chars // len(corpus) + 1)
+
+
+def main():
+    print(f"{'chars':>10} {'ms/convert':>12}")
+    for size in SIZES:
+        prompt = build_prompt(size)
+        repeat = 20 if size <= 10_000 else 3
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            convert_to_poml(prompt, SETTINGS)
+            best = min(best, time.perf_counter() - start)
+        print(f"{len(prompt):>10} {best * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: bursts of model calls against a quota-enforcing fake server, with and without LLMGateway.
+
+The fake server admits ``--server-rps`` calls per rolling second and answers
+429 beyond that, like a provider quota. Many threads fire calls at once; the
+gateway should turn the 429s into smoothed, retried successes.
+
+Run from the repository root:
+    python benchmarks/bench_gateway.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_gateway import LLMGateway
+
+
+class QuotaExceeded(Exception):
+    code = 429
+
+
+class FakeServer:
+    """generate_content with fixed latency and a rolling one-second request quota"""
+    model_name = 'fake-server'
+
+    def __init__(self, requests_per_second, latency):
+        self.requests_per_second = requests_per_second
+        self.latency = latency
+        self.accepted = deque()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self.lock:
+            now = time.monotonic()
+            while self.accepted and now - self.accepted[0] >= 1.0:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.requests_per_second:
+                self.rejected += 1
+                raise QuotaExceeded("429 quota exceeded")
+            self.accepted.append(now)
+        time.sleep(self.latency)
+        return type('Response', (), {'text': 'ok ' + prompt})()
+
+
+def run(model, calls, threads):
+    def call(i):
+        try:
+            model.generate_content(f'prompt {i}')
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        succeeded = sum(executor.map(call, range(calls)))
+    return succeeded, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--server-rps', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':>10} {'ok':>5} {'429s':>6} {'seconds':>8} {'retries':>8} {'throttled':>10} {'max queue':>10}")
+    server = FakeServer(args.server_rps, args.latency)
+    succeeded, elapsed = run(server, args.calls, args.threads)
+    print(f"{'direct':>10} {succeeded:>5} {server.rejected:>6} {elapsed:>8.2f} {'-':>8} {'-':>10} {'-':>10}")
+
+    server = FakeServer(args.server_rps, args.latency)
+    # Budget slightly under the server quota, with a one-second burst allowance
+    gateway = LLMGateway(requests_per_minute=args.server_rps * 60 * 0.9, tokens_per_minute=0,
+                         max_concurrency=8, max_retries=6, base_delay=0.05, max_delay=1.0, burst_seconds=1.0)
+    succeeded, elapsed = run(gateway.wrap(server), args.calls, args.threads)
+    stats = gateway.stats()
+    print(f"{'gateway':>10} {succeeded:>5} {server.rejected:>6} {elapsed:>8.2f} {stats['retries']:>8} "
+          f"{stats['throttled']:>10} {stats['max_queue_depth']:>10}")
+    return 0 if succeeded == args.calls else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
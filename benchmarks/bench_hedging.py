@@ -0,0 +1,65 @@
+"""Benchmark: tail latency with and without hedged requests, against the local fake backend.
+
+Calls go through a gateway to a FakeBackend with a heavy-tailed latency
+distribution. With hedging, a call slower than the chosen percentile of
+recent calls gets a backup request and the first answer wins.
+
+Run from the repository root:
+    python benchmarks/bench_hedging.py
+    python benchmarks/bench_hedging.py --latency lognormal:0.2,1.0 --percentile 90 --max-extra 0.2 --stream
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backends import FakeBackend
+from llm_gateway import LLMGateway
+from llm_hedging import Hedger
+from poml_core import generate_response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(model, calls, threads, stream):
+    """Seconds to the answer (first token when streaming) of each call"""
+    def call(i):
+        metrics = {}
+        generate_response(model, f'Question {i}: explain the result.', on_text=(lambda text: None) if stream else None,
+                          metrics=metrics)
+        return metrics['ttft_s'] if stream else metrics['total_s']
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency', default='lognormal:0.1,0.8', help="Fake time-to-first-token distribution")
+    parser.add_argument('--percentile', type=float, default=95)
+    parser.add_argument('--max-extra', type=float, default=0.1, help="Backup calls allowed per call")
+    parser.add_argument('--stream', action='store_true', help="Stream responses and measure time to first token")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'calls':>6} {'hedged':>7} {'won':>5}")
+    for hedged in (False, True):
+        backend = FakeBackend(latency=args.latency, tokens_per_second=0, input_tokens_per_second=0, seed=7)
+        gateway = LLMGateway(requests_per_minute=0, tokens_per_minute=0, max_concurrency=args.threads * 2)
+        hedger = Hedger(enabled=hedged, percentile=args.percentile, max_extra=args.max_extra)
+        latencies = run(hedger.wrap(gateway.wrap(backend)), args.calls, args.threads, args.stream)
+        stats = hedger.stats()
+        print(f"{'hedged' if hedged else 'plain':>8} {percentile(latencies, 0.5):>7.3f} {percentile(latencies, 0.95):>7.3f} "
+              f"{percentile(latencies, 0.99):>7.3f} {max(latencies):>7.3f} {backend.calls:>6} "
+              f"{stats['hedged']:>7} {stats['hedge_wins']:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: cold import time of poml_core, the converter/renderer core.
+
+Each measurement is a fresh interpreter, so nothing is cached in-process.
+Fails (exit 1) if the import pulls in streamlit or google.generativeai, or if
+the best time exceeds the budget.
+
+Run from the repository root:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget-ms 150 --runs 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('streamlit', 'google.generativeai')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed * 1000)
+print(','.join(heavy))
+"""
+
+
+def measure(module):
+    """(import ms, heavy modules loaded) for ``module`` in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout.splitlines()
+    return float(output[0]), [name for name in output[1].split(',') if name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per module (best is reported)")
+    parser.add_argument('--budget-ms', type=float, default=150.0, help="Maximum allowed import time of poml_core")
+    parser.add_argument('--compare-app', action='store_true', help="Also time importing app_simple")
+    args = parser.parse_args(argv)
+
+    modules = ['poml_core', 'batch_convert'] + (['app_simple'] if args.compare_app else [])
+    failed = False
+    print(f"{'module':>14} {'best ms':>9} {'heavy modules'}")
+    for module in modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        best = min(ms for ms, _ in runs)
+        heavy = runs[0][1]
+        print(f"{module:>14} {best:>9.1f} {', '.join(heavy) or '-'}")
+        if module != 'app_simple' and (heavy or best > args.budget_ms):
+            failed = True
+
+    if failed:
+        print(f"FAIL: core import loads UI/LLM modules or exceeds {args.budget_ms:.0f} ms", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Benchmark: render throughput of compiled {{var}} interpolation.
+
+Compares substituting variables with a regex on every render against
+rendering a template compiled once, in-process and through render_rows. Run from the repository root:
+    python benchmarks/bench_interpolation.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_parser import parse_poml
+from poml_template import PLACEHOLDER_PATTERN, collect_let_variables, compile_text, render_rows
+
+TEMPLATE = '''<poml>
+  <let name="genre" value="science fiction" />
+  <let name="mood" value="mysterious" />
+  <role>Bestselling {{genre}} author known for {{mood}} storylines</role>
+  <task>Create an engaging opening paragraph for a {{length}}-word {{genre}} short story set in {{setting}}</task>
+  <constraints>
+    <list>
+      <item>Main character: {{character}}</item>
+      <item>Tone must stay {{mood}} throughout</item>
+    </list>
+  </constraints>
+  <output-format>
+    <h3>Opening Paragraph</h3>
+    <p>Compelling first paragraph ({{length}} words)</p>
+  </output-format>
+</poml>'''
+
+RENDERS = 100_000
+
+
+def make_rows(count):
+    settings = ['a derelict space station', 'a drowned city', 'a desert monastery']
+    for i in range(count):
+        yield {
+            'length': 100 + i % 50,
+            'setting': settings[i % len(settings)],
+            'character': f'Navigator #{i}'
+        }
+
+
+def regex_render(text, defaults, rows):
+    """Re-scan the text for placeholders on every render"""
+    for row in rows:
+        variables = {**defaults, **row}
+        PLACEHOLDER_PATTERN.sub(lambda m: str(variables.get(m.group(1), m.group(0))), text)
+
+
+def compiled_render(template, defaults, rows):
+    for row in rows:
+        template.render({**defaults, **row})
+
+
+def streamed_render(template, defaults, rows, processes=None):
+    for _ in render_rows(template, defaults, rows, processes=processes, chunksize=1024):
+        pass
+
+
+def main():
+    document = parse_poml(TEMPLATE)
+    defaults = collect_let_variables(document)
+    text = re.sub(r'<let[^>]*/>', '', TEMPLATE)
+    template = compile_text(text)
+
+    sample = next(make_rows(1))
+    expected = PLACEHOLDER_PATTERN.sub(lambda m: str({**defaults, **sample}[m.group(1)]), text)
+    assert template.render({**defaults, **sample}) == expected
+
+    cases = [
+        ('regex per render', lambda rows: regex_render(text, defaults, rows)),
+        ('compiled template', lambda rows: compiled_render(template, defaults, rows)),
+        ('render_rows', lambda rows: streamed_render(template, defaults, rows)),
+        ('render_rows x4 procs', lambda rows: streamed_render(template, defaults, rows, processes=4)),
+    ]
+    for label, func in cases:
+        start = time.perf_counter()
+        func(make_rows(RENDERS))
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20} {RENDERS / elapsed:>12,.0f} renders/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: keyword-index response scoring vs the legacy per-term lower() sweeps.
+
+Run from the repository root:
+    python benchmarks/bench_keywords.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_core import analyze_response, detect_content_domain
+
+STRUCTURE = ['step', 'analysis', 'solution', 'answer', 'conclusion', '#', '##', '###']
+TECHNICAL = ['formula', 'equation', 'calculation', 'mechanism', 'analysis', 'theory', 'principle']
+VOCABULARY = ('the graph vertex proof step we let then for solution answer compute value result '
+              'theorem equation market story dataset analysis ### ## the of and to in is').split()
+
+
+def legacy_analyze_response(text):
+    """analyze_response as it was before the keyword index"""
+    words = len(text.split())
+    structure_count = sum(1 for indicator in STRUCTURE if indicator.lower() in text.lower())
+    technical_count = sum(1 for term in TECHNICAL if term.lower() in text.lower())
+    structure_score = min(100, structure_count * 8)
+    completeness_score = min(100, words / 10)
+    technical_score = min(100, technical_count * 12)
+    return {
+        'words': words,
+        'structure_score': round(structure_score, 1),
+        'completeness_score': round(completeness_score, 1),
+        'technical_score': round(technical_score, 1),
+        'overall_score': round((structure_score + completeness_score + technical_score) / 3, 1)
+    }
+
+
+def make_responses(count, words):
+    rng = random.Random(0)
+    return [' '.join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)]
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'words':>8} {'legacy analyze/s':>17} {'analyze_response/s':>19} {'domain/s':>10}")
+    for words in (500, 5_000, 50_000):
+        responses = make_responses(2_000 if words <= 5_000 else 200, words)
+        assert all(legacy_analyze_response(r) == analyze_response(r) for r in responses[:50])
+        legacy = timed(legacy_analyze_response, responses)
+        current = timed(analyze_response, responses)
+        domain = timed(detect_content_domain, responses)
+        print(f"{words:>8} {len(responses) / legacy:>17,.0f} {len(responses) / current:>19,.0f} "
+              f"{len(responses) / domain:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Load test: concurrent sessions running olympiad challenges against the local fake backend.
+
+Each session runs both sides of a challenge at once (plain text and POML,
+streamed), the way the app does, through the shared gateway. Reports
+end-to-end throughput and latency percentiles; no network or API key needed.
+
+Run from the repository root:
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --sessions 64 --latency lognormal:1.5,0.6 --error-rate 0.05
+    python benchmarks/bench_load.py --same-challenge --coalesce   # a workshop on the default challenge
+    python benchmarks/bench_load.py --same-challenge --coalesce --abandon 0.5 --concurrency 4
+
+``--abandon`` makes a share of the sessions stop reading after the first
+chunk, as a Streamlit rerun does mid-stream; every gateway slot and shared
+call must be given back by the end of the run. An abandoned stream is
+closed by its reader thread once its next chunk arrives, so the counts are
+read after a short grace period.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_backends import FakeBackend
+from llm_gateway import LLMGateway
+from llm_singleflight import SingleFlight
+from poml_core import POMLRenderer, execute_plain_text, get_olympiad_challenges, is_error_response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class Abandoned(Exception):
+    """Raised from the streaming callback to stop reading, like a rerun does"""
+
+
+def stop_reading(text):
+    raise Abandoned()
+
+
+def run_challenge(model, challenge, pool, abandon=False):
+    """Both sides of one challenge concurrently; returns (seconds, [call metrics], failed sides), None if abandoned"""
+    on_text = stop_reading if abandon else lambda text: None
+    start = time.perf_counter()
+    plain_metrics, poml_metrics = {}, {}
+    plain = pool.submit(execute_plain_text, challenge['plain_text'], model, on_text=on_text, metrics=plain_metrics)
+    poml = pool.submit(POMLRenderer(model).execute_with_ai, challenge['poml'], on_text=on_text, metrics=poml_metrics)
+    failed = sum(1 for future in (plain, poml) if is_error_response(future.result()))
+    if abandon:
+        return None
+    return time.perf_counter() - start, [m for m in (plain_metrics, poml_metrics) if m], failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=32, help="Concurrent user sessions")
+    parser.add_argument('--runs', type=int, default=4, help="Challenges run per session")
+    parser.add_argument('--latency', default='lognormal:0.5,0.5', help="Fake time-to-first-token distribution")
+    parser.add_argument('--tokens-per-second', type=float, default=400.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rpm', type=float, default=0, help="Gateway requests/minute (0: unlimited)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Gateway concurrency cap")
+    parser.add_argument('--same-challenge', action='store_true', help="Every session runs the first challenge")
+    parser.add_argument('--coalesce', action='store_true', help="Share identical calls in flight (SingleFlight)")
+    parser.add_argument('--abandon', type=float, default=0.0,
+                        help="Share of challenges whose session stops reading after the first chunk")
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          error_rate=args.error_rate, response_words=400)
+    gateway = LLMGateway(requests_per_minute=args.rpm, tokens_per_minute=0, max_concurrency=args.concurrency,
+                         base_delay=0.05, max_delay=1.0)
+    model = gateway.wrap(backend)
+    singleflight = SingleFlight()
+    if args.coalesce:
+        model = singleflight.wrap(model)
+    challenges = list(get_olympiad_challenges().values())
+    if args.same_challenge:
+        challenges = challenges[:1]
+
+    durations, calls, failures, abandoned = [], [], 0, 0
+    start = time.perf_counter()
+    # One thread per session plus two per session for its concurrent calls
+    with ThreadPoolExecutor(args.sessions * 2) as call_pool, ThreadPoolExecutor(args.sessions) as sessions:
+        jobs = [sessions.submit(run_challenge, model, challenges[i % len(challenges)], call_pool,
+                                int((i + 1) * args.abandon) > int(i * args.abandon))
+                for i in range(args.sessions * args.runs)]
+        for job in jobs:
+            if job.result() is None:
+                abandoned += 1
+                continue
+            seconds, metrics, failed = job.result()
+            durations.append(seconds)
+            calls.extend(metrics)
+            failures += failed
+    elapsed = time.perf_counter() - start
+
+    ttft = [m['ttft_s'] for m in calls]
+    stats = gateway.stats()
+    print(f"challenges: {len(durations)}  calls: {stats['requests']}  failures: {failures}  "
+          f"retries: {stats['retries']}  max queue: {stats['max_queue_depth']}")
+    if args.coalesce:
+        coalescing = singleflight.stats()
+        print(f"coalesced: {coalescing['collapsed']} of {coalescing['requests']} calls")
+    if args.abandon:
+        # Abandoned streams are closed from their reader threads; give them a moment
+        deadline = time.monotonic() + 2.0
+        while (gateway.stats()['in_flight'] or singleflight.stats()['in_flight']) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = gateway.stats()
+        held = f"{stats['in_flight']} gateway slots, {singleflight.stats()['in_flight']} shared calls"
+        print(f"abandoned: {abandoned} challenges  still held after the run: {held}")
+    print(f"throughput: {len(durations) / elapsed:.1f} challenges/s over {elapsed:.1f}s")
+    print(f"{'':>14} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+    for name, values in (('challenge s', durations), ('first token s', ttft)):
+        print(f"{name:>14} {percentile(values, 0.5):>7.2f} {percentile(values, 0.95):>7.2f} "
+              f"{percentile(values, 0.99):>7.2f} {max(values, default=0):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Benchmark: prompt size of full vs compact (POML_COMPACT_PROMPTS) rendering.
+
+Renders every bundled Olympiad challenge both ways and reports characters and
+estimated tokens saved per challenge and overall.
+
+Run from the repository root:
+    python benchmarks/bench_minify.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_core import POMLRenderer, get_olympiad_challenges
+from token_accounting import estimate_tokens
+
+
+def percent(saved, total):
+    return saved / total * 100 if total else 0.0
+
+
+def main():
+    full, compact = POMLRenderer(compact=False), POMLRenderer(compact=True)
+    totals = [0, 0, 0, 0]
+    print(f"{'chars':>7} {'compact':>8} {'saved':>7} {'tokens':>7} {'compact':>8} {'saved':>7}  challenge")
+    for name, challenge in get_olympiad_challenges().items():
+        before = full.poml_to_prompt(challenge['poml'])
+        after = compact.poml_to_prompt(challenge['poml'])
+        sizes = [len(before), len(after), estimate_tokens(before), estimate_tokens(after)]
+        totals = [total + size for total, size in zip(totals, sizes)]
+        print(f"{sizes[0]:>7} {sizes[1]:>8} {percent(sizes[0] - sizes[1], sizes[0]):>6.1f}% "
+              f"{sizes[2]:>7} {sizes[3]:>8} {percent(sizes[2] - sizes[3], sizes[2]):>6.1f}%  {name}")
+    print(f"{totals[0]:>7} {totals[1]:>8} {percent(totals[0] - totals[1], totals[0]):>6.1f}% "
+          f"{totals[2]:>7} {totals[3]:>8} {percent(totals[2] - totals[3], totals[2]):>6.1f}%  all challenges")
+
+
+if __name__ == '__main__':
+    main()
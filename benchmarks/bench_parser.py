@@ -0,0 +1,73 @@
+"""Benchmark: single-pass POML parser vs the legacy per-tag regex scans.
+
+Run from the repository root:
+    python benchmarks/bench_parser.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_parser import parse_poml
+
+SECTIONS = ['role', 'task', 'constraints', 'example', 'output-format']
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+
+
+def legacy_sections(poml_content):
+    """The regex pipeline POMLRenderer.poml_to_prompt used before the parser"""
+    content = re.sub(r'</?poml[^>]*>', '', poml_content)
+    results = {}
+    for tag in SECTIONS:
+        match = re.search(f'<{tag}[^>]*>(.*?)</{tag}>', content, re.DOTALL)
+        results[tag] = match.group(1).strip() if match else None
+    return results
+
+
+def parser_sections(poml_content):
+    document = parse_poml(poml_content)
+    results = {}
+    for tag in SECTIONS:
+        element = document.find(tag)
+        results[tag] = element.inner_source().strip() if element else None
+    return results
+
+
+def build_template(target_bytes):
+    """Olympiad-style template whose constraint list grows to the target size"""
+    head = ('<poml>\n  <role>Expert competitive programmer</role>\n'
+            '  <task>Design an optimal algorithm</task>\n  <constraints>\n    <list>\n')
+    tail = ('    </list>\n  </constraints>\n  <example>\n    Clear decomposition and proofs\n  </example>\n'
+            '  <output-format>\n    <h3>Problem Analysis</h3>\n    <p>Complexity analysis</p>\n'
+            '  </output-format>\n</poml>')
+    item = '      <item>Constraint: vertex weights satisfy w(v) ≤ 10^9 for every v</item>\n'
+    count = max(1, (target_bytes - len(head) - len(tail)) // len(item.encode('utf-8')))
+    return head + item * count + tail
+
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'size':>10} {'legacy ms':>12} {'parser ms':>12} {'parser MB/s':>12}")
+    for size in SIZES:
+        template = build_template(size)
+        assert legacy_sections(template) == parser_sections(template)
+        repeat = 20 if size <= 100_000 else 3
+        legacy = best_of(legacy_sections, template, repeat)
+        parsed = best_of(parser_sections, template, repeat)
+        mb = len(template.encode('utf-8')) / 1e6
+        print(f"{len(template):>10} {legacy * 1000:>12.2f} {parsed * 1000:>12.2f} {mb / parsed:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
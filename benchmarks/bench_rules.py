@@ -0,0 +1,72 @@
+"""Benchmark and equivalence check: converter RuleSets vs per-pattern re.search.
+
+For every converter stage, each sentence of a fixed corpus is matched both
+ways; the script fails if any rule's match differs. Run from the repository root:
+    python benchmarks/bench_rules.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poml_core import CONVERTER_RULE_DATA, CONVERTER_RULES, SENTENCE_SPLIT, get_olympiad_challenges
+
+EXTRA_PROMPTS = [
+    "You are a data scientist. Analyze this sales dataset and provide insights on customer behavior patterns.",
+    "Act as a senior software architect, and design a microservices system. Note that the API must be "
+    "backward compatible. For example, the account service must expose the same endpoints. Make sure to "
+    "include a migration plan.",
+    "Please write a short story about a robot. Hint: consider using dialogue. Keep in mind that the "
+    "audience is children aged 8-10. e.g. a robot who paints sunsets for a lonely lighthouse keeper.",
+    "Can you calculate the probability that two dice sum to 7 where the dice are fair? Explain the formula.",
+]
+
+
+def corpus_sentences():
+    texts = [c['plain_text'] for c in get_olympiad_challenges().values()] + EXTRA_PROMPTS
+    sentences = [s.strip() for text in texts for s in SENTENCE_SPLIT.split(text) if s.strip()]
+    return sentences * 50
+
+
+def sequential(stage, sentence):
+    """What the converter did before: one re.search per pattern"""
+    results = []
+    for rule_name, pattern, _ in CONVERTER_RULE_DATA[stage]:
+        match = re.search(pattern, sentence, re.IGNORECASE)
+        results.append((rule_name, match.span() if match else None, match.groups() if match else None))
+    return results
+
+
+def rule_set(stage, sentence):
+    return [(rule.name, match.span() if match else None, match.groups() if match else None)
+            for rule, match in CONVERTER_RULES[stage].search(sentence)]
+
+
+def main():
+    sentences = corpus_sentences()
+    for stage in CONVERTER_RULE_DATA:
+        for sentence in sentences[:len(sentences) // 50]:
+            assert sequential(stage, sentence) == rule_set(stage, sentence), (stage, sentence)
+    print(f"equivalent on {len(sentences) // 50} sentences x {len(CONVERTER_RULE_DATA)} stages")
+
+    print(f"{'stage':<18} {'per-pattern ms':>15} {'RuleSet ms':>12}")
+    for stage, rules in CONVERTER_RULE_DATA.items():
+        start = time.perf_counter()
+        for sentence in sentences:
+            for _, pattern, _ in rules:
+                re.search(pattern, sentence, re.IGNORECASE)
+        per_pattern = time.perf_counter() - start
+
+        rules_for_stage = CONVERTER_RULES[stage]
+        start = time.perf_counter()
+        for sentence in sentences:
+            rules_for_stage.matches(sentence)
+        engine = time.perf_counter() - start
+        print(f"{stage:<18} {per_pattern * 1000:>15.2f} {engine * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
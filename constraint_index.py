@@ -0,0 +1,112 @@
+"""Near-duplicate index for extracted constraints.
+
+Each constraint's word set is summarised by a MinHash signature, and the
+signature is split into LSH bands. Only constraints sharing a band bucket with
+a new one are compared exactly, so an insert costs about the same no matter
+how many constraints are already indexed. Candidates are verified with the
+converter's original word-overlap rule, so a pair is only ever reported as a
+duplicate if the old pairwise check would have said so too.
+"""
+
+import hashlib
+from array import array
+
+from keyword_index import KeywordIndex
+
+
+class ConstraintIndex:
+    """Set of constraints that rejects exact and near duplicates on insert.
+
+    ``threshold`` is the word-overlap ratio |A & B| / max(|A|, |B|) above
+    which two constraints are duplicates; such a pair has Jaccard similarity
+    of at least 2/3. With the default 32 bands of 4 rows, LSH misses a pair at
+    exactly that similarity with probability below 1e-3, and far less for
+    closer pairs.
+    ``key_phrases`` optionally adds the rule that two constraints sharing a
+    key phrase and differing in length by less than ``phrase_length_delta``
+    characters are duplicates.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=32, key_phrases=None, phrase_length_delta=20):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.word_hashes = {}
+        self.buckets = [{} for _ in range(bands)]
+        self.exact = set()
+        self.word_sets = []
+        self.lengths = []
+        self.phrase_index = KeywordIndex({'key_phrases': key_phrases}) if key_phrases else None
+        self.phrase_members = {}
+        self.phrase_length_delta = phrase_length_delta
+        self.comparisons = 0
+
+    def __len__(self):
+        return len(self.word_sets)
+
+    def word_hash(self, word):
+        """``num_perm`` independent 32-bit hashes of a word, one per MinHash permutation"""
+        hashes = self.word_hashes.get(word)
+        if hashes is None:
+            hashes = array('I', hashlib.shake_128(word.encode('utf-8')).digest(4 * self.num_perm))
+            self.word_hashes[word] = hashes
+        return hashes
+
+    def signature(self, words):
+        if not words:
+            return [0] * self.num_perm
+        return list(map(min, zip(*map(self.word_hash, words))))
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [tuple(signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def is_duplicate(self, constraint):
+        return self._check(constraint)[0]
+
+    def add(self, constraint):
+        """Insert ``constraint`` unless it duplicates one already indexed; returns True if added"""
+        duplicate, lowered, words, keys, phrases = self._check(constraint)
+        if duplicate:
+            return False
+
+        position = len(self.word_sets)
+        self.exact.add(lowered)
+        self.word_sets.append(words)
+        self.lengths.append(len(constraint))
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append(position)
+        for phrase in phrases:
+            self.phrase_members.setdefault(phrase, []).append(position)
+        return True
+
+    def _check(self, constraint):
+        if not constraint:
+            return True, None, None, None, ()
+
+        lowered = constraint.lower()
+        words = set(lowered.split())
+        keys = self.band_keys(self.signature(words))
+        phrases = self.phrase_index.counts(lowered, lowered=True) if self.phrase_index else ()
+
+        if lowered in self.exact:
+            return True, lowered, words, keys, phrases
+
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for position in candidates:
+            self.comparisons += 1
+            existing = self.word_sets[position]
+            if len(words & existing) / max(len(words), len(existing)) > self.threshold:
+                return True, lowered, words, keys, phrases
+
+        for phrase in phrases:
+            for position in self.phrase_members.get(phrase, ()):
+                if abs(len(constraint) - self.lengths[position]) < self.phrase_length_delta:
+                    return True, lowered, words, keys, phrases
+
+        return False, lowered, words, keys, phrases
@@ -0,0 +1,138 @@
+"""Background job queue for long model calls, shared by every session.
+
+Streamlit runs the whole script again on every interaction and abandons the
+previous run, so a model call made inside the script is lost as soon as the
+user clicks anything. Calls submitted here run on a process-wide worker pool
+instead; the session keeps only the job id, and any later run (a rerun, or
+a periodic refresh) looks the job up to show its progress or result.
+
+Finished jobs are kept until collected, or for ``POML_JOB_TTL`` seconds after
+they finish. The pool has ``POML_JOB_WORKERS`` threads.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = int(os.getenv('POML_JOB_WORKERS', '16'))
+DEFAULT_RESULT_TTL = float(os.getenv('POML_JOB_TTL', '900'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """One submitted task; ``text`` and ``metrics`` are progress the task reports while it runs"""
+
+    def __init__(self, job_id, task):
+        self.id = job_id
+        self.task = task
+        self.status = QUEUED
+        self.text = None
+        self.metrics = {}
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    def report(self, text):
+        """Progress callback for the task, e.g. an ``on_text`` streaming callback"""
+        self.text = text
+
+    def outcome(self):
+        """The task's return value; re-raises its exception if it failed"""
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class JobQueue:
+    def __init__(self, workers=DEFAULT_WORKERS, result_ttl=DEFAULT_RESULT_TTL, clock=time.time):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='poml-job')
+        self._lock = threading.Lock()
+        self._jobs = {}   # job id -> Job, until collected or expired
+        self.counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'collected': 0, 'expired': 0}
+
+    def submit(self, task):
+        """Run ``task(job)`` in the background; returns the Job (keep ``job.id`` to find it again)"""
+        self.purge_expired()
+        job = Job(uuid.uuid4().hex, task)
+        with self._lock:
+            self._jobs[job.id] = job
+            self.counts['submitted'] += 1
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.started = self.clock()
+        try:
+            job.result = job.task(job)
+            status = DONE
+        except Exception as e:
+            job.error = e
+            status = FAILED
+        job.task = None
+        with self._lock:
+            job.finished = self.clock()
+            job.status = status
+            self.counts['completed' if status == DONE else 'failed'] += 1
+
+    def get(self, job_id):
+        """The job, or None if it is unknown, collected or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and self._expired(job):
+                del self._jobs[job_id]
+                self.counts['expired'] += 1
+                return None
+            return job
+
+    def collect(self, job_id):
+        """The finished job, removed from the queue; None while it is still running or if it is gone"""
+        job = self.get(job_id)
+        if job is None or not job.done:
+            return None
+        with self._lock:
+            if self._jobs.pop(job_id, None) is None:
+                return None
+            self.counts['collected'] += 1
+        return job
+
+    def _expired(self, job):
+        return job.done and self.result_ttl and self.clock() - job.finished > self.result_ttl
+
+    def purge_expired(self):
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if self._expired(job)]
+            for job_id in expired:
+                del self._jobs[job_id]
+            self.counts['expired'] += len(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            stats = dict(self.counts)
+        stats.update({
+            'queued': statuses.count(QUEUED),
+            'running': statuses.count(RUNNING),
+            'uncollected': statuses.count(DONE) + statuses.count(FAILED),
+            'workers': self.workers
+        })
+        return stats
+
+
+job_queue = JobQueue()
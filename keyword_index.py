@@ -0,0 +1,59 @@
+"""Grouped keyword index for domain detection and response scoring.
+
+Terms from every group (domains, structure indicators, technical terms...)
+are deduplicated into one index built once at import. A scan lowercases the
+text once and checks or counts each distinct term once, however many groups
+share it.
+
+A pure-Python Aho-Corasick automaton was measured ~10x slower than this on
+CPython: walking the text a character at a time in the interpreter costs far
+more than a few dozen C-level ``str.count`` calls over the same buffer.
+"""
+
+
+class KeywordIndex:
+    def __init__(self, groups=None):
+        self.groups = {}   # group -> {term: weight}
+        self.terms = ()    # distinct terms across all groups, in insertion order
+        for group, terms in (groups or {}).items():
+            for term in terms:
+                if isinstance(terms, dict):
+                    self.add(group, term, terms[term])
+                else:
+                    self.add(group, term)
+
+    def add(self, group, term, weight=1):
+        term = term.lower()
+        self.groups.setdefault(group, {})[term] = weight
+        if term not in self.terms:
+            self.terms = self.terms + (term,)
+
+    def counts(self, text, lowered=False):
+        """{term: occurrences} for every indexed term present in the text"""
+        if not lowered:
+            text = text.lower()
+        found = {}
+        for term in self.terms:
+            count = text.count(term)
+            if count:
+                found[term] = count
+        return found
+
+    def present(self, text, lowered=False):
+        """{group: set of terms present}; stops at each term's first occurrence"""
+        if not lowered:
+            text = text.lower()
+        found = {term for term in self.terms if term in text}
+        return {group: found.intersection(terms) for group, terms in self.groups.items()}
+
+    def scan(self, text, lowered=False):
+        """{group: {term: occurrences}} for every group, empty when nothing matched"""
+        found = self.counts(text, lowered)
+        return {group: {term: found[term] for term in terms if term in found}
+                for group, terms in self.groups.items()}
+
+    def scores(self, text, lowered=False):
+        """{group: sum of weight x occurrences}"""
+        found = self.counts(text, lowered)
+        return {group: sum(weight * found.get(term, 0) for term, weight in terms.items())
+                for group, terms in self.groups.items()}
@@ -0,0 +1,328 @@
+"""LLM backends: the interface every model call goes through, Gemini and a local fake.
+
+A backend is any object with
+
+    generate_content(prompt, stream=False, **kwargs) -> response
+    model_name
+
+where the response has ``text``, ``candidates`` (each with ``finish_reason``
+and ``content.parts``) and optionally ``usage_metadata``, and with
+``stream=True`` is iterable as chunks with ``text``. That is the shape of
+``google.generativeai`` responses, so the Gemini backend is a thin adapter;
+FakeBackend produces the same shape offline for benchmarks and load tests.
+
+``create_backend()`` picks one by name (``POML_LLM_BACKEND``: gemini or fake).
+"""
+
+import copy
+import datetime
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_BACKEND = os.getenv('POML_LLM_BACKEND', 'gemini')
+DEFAULT_GEMINI_MODEL = 'gemini-2.5-flash'
+
+# Smallest prompt prefix Gemini accepts for an explicit context cache
+GEMINI_MIN_CACHE_TOKENS = int(os.getenv('GEMINI_MIN_CACHE_TOKENS', '1024'))
+
+# Fake backend defaults, so the app can run offline with a realistic feel
+FAKE_LATENCY = os.getenv('POML_FAKE_LATENCY', 'lognormal:0.8,0.5')
+FAKE_TOKENS_PER_SECOND = float(os.getenv('POML_FAKE_TOKENS_PER_SECOND', '80'))
+FAKE_ERROR_RATE = float(os.getenv('POML_FAKE_ERROR_RATE', '0'))
+FAKE_BLOCK_RATE = float(os.getenv('POML_FAKE_BLOCK_RATE', '0'))
+FAKE_INPUT_TOKENS_PER_SECOND = float(os.getenv('POML_FAKE_INPUT_TOKENS_PER_SECOND', '5000'))
+
+# Candidate.finish_reason values, as in the Gemini API
+FINISH_STOP = 1
+FINISH_MAX_TOKENS = 2
+FINISH_SAFETY = 3
+FINISH_RECITATION = 4
+
+
+def prefix_digest(prefix):
+    return hashlib.blake2b(prefix.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class GeminiBackend:
+    """google.generativeai.GenerativeModel behind the backend interface (SDK imported on first use)"""
+
+    # Context caches created so far, shared by every backend in the process:
+    # (credential, model name, prefix digest) -> (Future of the CachedContent, or of None if creation
+    # failed; refresh time). The lock only guards this dict, never a round trip to the API.
+    _context_caches = {}
+    _context_lock = threading.Lock()
+
+    def __init__(self, model_name=DEFAULT_GEMINI_MODEL, api_key=None, model=None, **model_options):
+        import google.generativeai as genai
+        if api_key:
+            genai.configure(api_key=api_key)
+        self.credential = prefix_digest(api_key or '')
+        self.model = model or genai.GenerativeModel(model_name, **model_options)
+        self.prefix_digest = None
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    def generate_content(self, prompt, **kwargs):
+        return self.model.generate_content(prompt, **kwargs)
+
+    def cache_prefix(self, prefix, ttl=3600):
+        """This model with ``prefix`` held in a Gemini context cache as its system instruction.
+
+        One cache per API key, model and prefix is created and reused until
+        shortly before it expires. Raises when the prefix is below the
+        provider minimum or creation failed (failures are remembered for
+        ``ttl`` so they cost one round trip, not one per request).
+        """
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        if len(prefix) // 4 < GEMINI_MIN_CACHE_TOKENS:
+            raise ValueError(f"Prefix is below the {GEMINI_MIN_CACHE_TOKENS}-token context cache minimum")
+        digest = prefix_digest(prefix)
+        key = (self.credential, self.model_name, digest)
+        with self._context_lock:
+            entry = self._context_caches.get(key)
+            creating = entry is None or entry[1] <= time.time()
+            if creating:
+                entry = self._context_caches[key] = (Future(), time.time() + ttl * 0.9)
+        if creating:
+            # Other callers of this prefix wait on the future; other prefixes are not held up
+            try:
+                content = caching.CachedContent.create(model=self.model_name, system_instruction=prefix,
+                                                       ttl=datetime.timedelta(seconds=ttl))
+            except Exception:
+                content = None
+            entry[0].set_result(content)
+        content = entry[0].result()
+        if content is None:
+            raise RuntimeError("Gemini context cache unavailable for this model")
+        prefixed = GeminiBackend(model=genai.GenerativeModel.from_cached_content(content))
+        prefixed.credential = self.credential
+        prefixed.prefix_digest = digest
+        return prefixed
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class FakeBackendError(Exception):
+    """Injected failure; ``code`` is an HTTP status so the gateway can classify it"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_latency(spec):
+    """Parse 'fixed:S', 'uniform:LOW,HIGH', 'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN' (seconds)"""
+    if isinstance(spec, (int, float)):
+        return ('fixed', float(spec))
+    kind, _, params = spec.partition(':')
+    values = tuple(float(value) for value in params.split(',') if value)
+    expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2, 'exponential': 1}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    return (kind,) + values
+
+
+def sample_latency(latency, rng):
+    kind = latency[0]
+    if kind == 'fixed':
+        return latency[1]
+    if kind == 'uniform':
+        return rng.uniform(latency[1], latency[2])
+    if kind == 'lognormal':
+        median, sigma = latency[1], latency[2]
+        return median * rng.lognormvariate(0, sigma)
+    return rng.expovariate(1 / latency[1]) if latency[1] else 0.0
+
+
+class FakePart:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeContent:
+    __slots__ = ('parts',)
+
+    def __init__(self, text):
+        self.parts = [FakePart(text)] if text else []
+
+
+class FakeCandidate:
+    __slots__ = ('content', 'finish_reason')
+
+    def __init__(self, text, finish_reason):
+        self.content = FakeContent(text)
+        self.finish_reason = finish_reason
+
+
+class FakeUsage:
+    __slots__ = ('prompt_token_count', 'cached_content_token_count', 'candidates_token_count', 'total_token_count')
+
+    def __init__(self, prompt_tokens, output_tokens, cached_tokens=0):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = cached_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """generate_content response; iterating it streams the text in timed chunks"""
+
+    def __init__(self, text, finish_reason, prompt_tokens, chunks=(), chunk_delay=0.0, sleep=time.sleep,
+                 cached_tokens=0):
+        self._text = text
+        self.candidates = [FakeCandidate(text, finish_reason)]
+        self.usage_metadata = FakeUsage(prompt_tokens, len(text.split()), cached_tokens)
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._sleep = sleep
+
+    @property
+    def text(self):
+        # Like the SDK: no text at all is an error, not an empty string
+        if not self._text:
+            raise ValueError("Response has no text; check candidates[0].finish_reason")
+        return self._text
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._chunk_delay:
+                self._sleep(self._chunk_delay)
+            yield FakeResponse(chunk, FINISH_STOP, 0)
+        if not self._chunks and not self._text:
+            yield self
+
+
+class FakeBackend:
+    """Offline backend with configurable latency, failures and responses.
+
+    - ``latency``: time to first token, a spec for parse_latency()
+    - ``input_tokens_per_second``: extra time to read uncached prompt tokens
+    - ``tokens_per_second``: streaming speed after the first token (0: instant)
+    - ``error_rate`` / ``error_code``: fraction of calls raising FakeBackendError
+    - ``block_rate``: fraction of calls returning a SAFETY-blocked response
+    - ``responses``: {prompt substring: text} canned answers; any other prompt
+      is echoed back in a structured answer of ``response_words`` words
+
+    Like Gemini, a call honours ``request_options={'timeout': seconds}`` (the
+    time to first token past it raises a 504 FakeBackendError) and
+    ``generation_config={'max_output_tokens': n}`` (longer answers are cut
+    to n words with finish reason MAX_TOKENS).
+
+    Outcomes are drawn from an RNG seeded by ``seed``, the prompt and how many
+    times that prompt has been seen, so a run is reproducible however calls
+    interleave across threads. ``cache_prefix`` is supported, so context
+    caching paths can be exercised offline.
+    """
+
+    def __init__(self, latency=FAKE_LATENCY, tokens_per_second=FAKE_TOKENS_PER_SECOND, error_rate=FAKE_ERROR_RATE,
+                 error_code=503, block_rate=FAKE_BLOCK_RATE, responses=None, response_words=300, seed=0,
+                 model_name='fake-llm', input_tokens_per_second=FAKE_INPUT_TOKENS_PER_SECOND, sleep=time.sleep):
+        self.latency = parse_latency(latency)
+        self.input_tokens_per_second = input_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.block_rate = block_rate
+        self.responses = responses or {}
+        self.response_words = response_words
+        self.seed = seed
+        self.model_name = model_name
+        self.sleep = sleep
+        self.prefix = ''
+        self.prefix_digest = None
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def cache_prefix(self, prefix, ttl=3600):
+        """A view of this backend that prepends ``prefix`` to every prompt and bills it as cached.
+
+        Applies the Gemini context cache minimum, so offline runs only report
+        cache savings that Gemini would give.
+        """
+        if len(prefix) // 4 < GEMINI_MIN_CACHE_TOKENS:
+            raise ValueError(f"Prefix is below the {GEMINI_MIN_CACHE_TOKENS}-token context cache minimum")
+        prefixed = copy.copy(self)
+        prefixed.prefix = self.prefix + prefix
+        prefixed.prefix_digest = prefix_digest(prefixed.prefix)
+        return prefixed
+
+    def _rng(self, prompt):
+        digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).hexdigest()
+        with self._lock:
+            self.calls += 1
+            occurrence = self._seen.get(digest, 0)
+            self._seen[digest] = occurrence + 1
+        return random.Random(f'{self.seed}:{digest}:{occurrence}')
+
+    def answer(self, prompt, rng):
+        for trigger, text in self.responses.items():
+            if trigger in prompt:
+                return text
+        first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), '')[:120]
+        words = ['## Step 1: Analysis', f'Restating the problem: {first_line}', '## Step 2: Solution']
+        filler = ('the', 'solution', 'formula', 'analysis', 'therefore', 'value', 'step', 'result', 'theory')
+        words.extend(rng.choice(filler) for _ in range(self.response_words))
+        words.append('## Conclusion\nThe answer follows from the analysis above.')
+        return ' '.join(words)
+
+    def generate_content(self, prompt, stream=False, generation_config=None, request_options=None, **kwargs):
+        if not isinstance(prompt, str):
+            prompt = str(prompt)
+        cached_tokens = len(self.prefix) // 4
+        uncached_tokens = max(1, len(prompt) // 4)
+        prompt = self.prefix + prompt
+        rng = self._rng(prompt)
+        first_token_delay = sample_latency(self.latency, rng)
+        if self.input_tokens_per_second:
+            first_token_delay += uncached_tokens / self.input_tokens_per_second
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and first_token_delay > timeout:
+            self.sleep(timeout)
+            raise FakeBackendError(f"504 Deadline of {timeout:.1f}s exceeded", 504)
+        self.sleep(first_token_delay)
+
+        roll = rng.random()
+        if roll < self.error_rate:
+            raise FakeBackendError(f"{self.error_code} injected failure", self.error_code)
+        prompt_tokens = cached_tokens + uncached_tokens
+        if roll < self.error_rate + self.block_rate:
+            return FakeResponse('', FINISH_SAFETY, prompt_tokens, cached_tokens=cached_tokens)
+
+        text = self.answer(prompt, rng)
+        finish_reason = FINISH_STOP
+        max_output_tokens = (generation_config or {}).get('max_output_tokens')
+        if max_output_tokens and len(text.split(' ')) > max_output_tokens:
+            text = ' '.join(text.split(' ')[:max_output_tokens])
+            finish_reason = FINISH_MAX_TOKENS
+        if not stream:
+            if self.tokens_per_second:
+                self.sleep(len(text.split()) / self.tokens_per_second)
+            return FakeResponse(text, finish_reason, prompt_tokens, cached_tokens=cached_tokens)
+
+        # About 20 words per chunk, paced at tokens_per_second
+        words = text.split(' ')
+        chunks = [' '.join(words[i:i + 20]) + (' ' if i + 20 < len(words) else '')
+                  for i in range(0, len(words), 20)]
+        delay = 20 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return FakeResponse(text, finish_reason, prompt_tokens, chunks, delay, self.sleep, cached_tokens)
+
+
+def create_backend(name=DEFAULT_BACKEND, **options):
+    """Backend by name: 'gemini' (options: model_name, api_key, ...) or 'fake' (FakeBackend options)"""
+    if name == 'gemini':
+        return GeminiBackend(**options)
+    if name == 'fake':
+        return FakeBackend(**options)
+    raise ValueError(f"Unknown LLM backend: {name!r}")
@@ -0,0 +1,289 @@
+"""Opt-in on-disk cache of LLM responses, shared by every session and process.
+
+Set ``POML_LLM_CACHE`` to a SQLite file path to enable it. Entries are keyed
+on the model name, its generation/safety settings and a digest of the prompt,
+expire after ``POML_LLM_CACHE_TTL`` seconds and are evicted least recently
+used first beyond ``POML_LLM_CACHE_SIZE`` entries.
+
+The database runs in WAL mode with one connection per thread, so concurrent
+Streamlit sessions (and batch processes) can read and write it at once.
+Only responses that produced text are stored; blocked or empty responses
+always go back to the model.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv('POML_LLM_CACHE', '')
+DEFAULT_TTL = float(os.getenv('POML_LLM_CACHE_TTL', str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv('POML_LLM_CACHE_SIZE', '10000'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def model_identity(model):
+    """(model name, settings) that change what a model returns for a prompt"""
+    name = getattr(model, 'model_name', None) or type(model).__name__
+    settings = {}
+    for attribute in ('_generation_config', '_safety_settings', '_system_instruction', 'prefix_digest'):
+        value = getattr(model, attribute, None)
+        if value:
+            settings[attribute.lstrip('_')] = value
+    return name, settings
+
+
+def request_key(model, prompt, **kwargs):
+    """Digest of the model identity, per-call generation arguments and prompt"""
+    name, settings = model_identity(model)
+    # Transport options (timeouts, retries) don't change the response
+    settings.update({key: value for key, value in kwargs.items() if key != 'request_options'})
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(name.encode('utf-8') + b'\0')
+    digest.update(json.dumps(settings, sort_keys=True, default=repr).encode('utf-8') + b'\0')
+    digest.update(prompt.encode('utf-8') if isinstance(prompt, str) else repr(prompt).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ModelWrapper:
+    """A drop-in model whose generate_content is ``generate(model, prompt, **kwargs)``.
+
+    The cache, gateway, hedger and singleflight all hand these out from
+    their ``wrap``. ``cache_prefix`` wraps the prefixed model the same way,
+    and every other attribute is read from the wrapped model; ``repr`` lists
+    the layers a call passes through, outermost first.
+    """
+
+    def __init__(self, model, generate, layer):
+        self.model = model
+        self.generate = generate
+        self.layer = layer
+
+    @property
+    def model_name(self):
+        return model_identity(self.model)[0]
+
+    def generate_content(self, prompt, **kwargs):
+        return self.generate(self.model, prompt, **kwargs)
+
+    def cache_prefix(self, prefix, ttl=3600):
+        return ModelWrapper(self.model.cache_prefix(prefix, ttl), self.generate, self.layer)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __repr__(self):
+        return f"{self.layer} -> {self.model!r}"
+
+
+def response_text(response):
+    """Text of a generate_content response, or None when it has none"""
+    try:
+        return response.text or None
+    except Exception:
+        # SDK responses raise instead of returning nothing when a candidate was blocked
+        return None
+
+
+class CachedResponse:
+    """Stands in for a generate_content response on a cache hit; streams as one chunk"""
+    __slots__ = ('text',)
+    candidates = ()
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        yield self
+
+
+class RecordingStream:
+    """Passes a streamed response through and calls ``on_complete`` once it is fully consumed"""
+
+    def __init__(self, response, on_complete):
+        self.response = response
+        self.on_complete = on_complete
+
+    def __iter__(self):
+        yield from self.response
+        self.on_complete(self.response)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class LLMCache:
+    """Persistent response cache with TTL and LRU eviction; disabled when ``path`` is empty"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.read_errors = 0
+        self.write_errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA busy_timeout = 30000')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            with self._lock:
+                if not self._ready:
+                    connection.execute('PRAGMA journal_mode = WAL')
+                    connection.executescript(SCHEMA)
+                    self._ready = True
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key):
+        """The cached text for ``key``, or None. A database error is logged and answered as a miss."""
+        try:
+            return self._lookup(key)
+        except (sqlite3.Error, OSError) as e:
+            # The caller falls through to the model; a broken cache only costs hits
+            self._count('read_errors')
+            logger.warning("could not read response cache %s: %s", self.path, e)
+            return None
+
+    def _lookup(self, key):
+        connection = self._connection()
+        row = connection.execute('SELECT text, created FROM responses WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl and now - row[1] > self.ttl:
+            connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._count('expirations')
+            row = None
+        if row is None:
+            self._count('misses')
+            return None
+        connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        self._count('hits')
+        return row[0]
+
+    def put(self, key, model_name, text):
+        if self.max_entries <= 0:
+            return
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, model_name, text, len(text.encode('utf-8')), now, now))
+            excess = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute('DELETE FROM responses WHERE key IN '
+                                   '(SELECT key FROM responses ORDER BY accessed LIMIT ?)', (excess,))
+                self._count('evictions', excess)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def generate(self, model, prompt, bypass=False, **kwargs):
+        """``model.generate_content(prompt, **kwargs)``, answered from the cache when possible.
+
+        Streamed and unstreamed calls share entries; a streamed miss is stored
+        once the caller has consumed the whole stream.
+        """
+        if bypass or not self.enabled:
+            return model.generate_content(prompt, **kwargs)
+        key = request_key(model, prompt, **{name: value for name, value in kwargs.items() if name != 'stream'})
+        text = self.get(key)
+        if text is not None:
+            return CachedResponse(text)
+
+        def store(response):
+            text = response_text(response)
+            if text is None:
+                return
+            try:
+                self.put(key, model_identity(model)[0], text)
+            except (sqlite3.Error, OSError) as e:
+                # A failed write only costs a future hit; the caller still gets its response
+                self._count('write_errors')
+                logger.warning("could not store response in %s: %s", self.path, e)
+
+        response = model.generate_content(prompt, **kwargs)
+        if kwargs.get('stream'):
+            return RecordingStream(response, store)
+        store(response)
+        return response
+
+    def wrap(self, model, bypass=False):
+        """A drop-in model whose generate_content goes through this cache"""
+        return ModelWrapper(model, functools.partial(self.generate, bypass=bypass), 'cache')
+
+    def purge_expired(self):
+        if not self.enabled or not self.ttl:
+            return 0
+        removed = self._connection().execute('DELETE FROM responses WHERE created < ?',
+                                             (time.time() - self.ttl,)).rowcount
+        self._count('expirations', removed)
+        return removed
+
+    def clear(self):
+        if self.enabled:
+            self._connection().execute('DELETE FROM responses')
+
+    def stats(self):
+        entries, size = 0, 0
+        if self.enabled:
+            try:
+                entries, size = self._connection().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("could not read response cache %s: %s", self.path, e)
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'read_errors': self.read_errors,
+                'write_errors': self.write_errors,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,419 @@
+"""Shared gateway for model calls: rate limits, a concurrency cap and retries.
+
+Every session in the process goes through one gateway, so bursts from many
+users are smoothed into the configured budget instead of tripping the
+provider's quota:
+
+- token buckets for requests/minute and tokens/minute (prompt tokens are
+  charged up front, output tokens once the response is complete)
+- a global cap on calls in flight
+- jittered exponential backoff on retryable errors (429, 5xx, timeouts),
+  never past a call's deadline (its ``request_options`` timeout)
+- a circuit breaker per model: once too many recent calls fail, further
+  calls fail fast with CircuitOpenError while a background probe checks
+  for recovery
+
+Limits come from ``POML_LLM_RPM``, ``POML_LLM_TPM``, ``POML_LLM_CONCURRENCY``
+and ``POML_LLM_MAX_RETRIES``; 0 disables a rate limit. The breaker opens at
+``POML_LLM_BREAKER_THRESHOLD`` (fraction of recent calls failing, 0 disables
+it) and probes every ``POML_LLM_BREAKER_COOLDOWN`` seconds while open.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from llm_cache import ModelWrapper, model_identity, response_text
+from token_accounting import estimate_tokens as local_estimate
+
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv('POML_LLM_RPM', '60'))
+DEFAULT_TOKENS_PER_MINUTE = float(os.getenv('POML_LLM_TPM', '1000000'))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('POML_LLM_CONCURRENCY', '8'))
+DEFAULT_MAX_RETRIES = int(os.getenv('POML_LLM_MAX_RETRIES', '4'))
+DEFAULT_BREAKER_THRESHOLD = float(os.getenv('POML_LLM_BREAKER_THRESHOLD', '0.5'))
+DEFAULT_BREAKER_COOLDOWN = float(os.getenv('POML_LLM_BREAKER_COOLDOWN', '30'))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+                         'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout'}
+TIMEOUT_STATUS_CODES = {408, 504}
+QUOTA_ERROR_NAMES = {'ResourceExhausted', 'TooManyRequests'}
+TIMEOUT_ERROR_NAMES = {'DeadlineExceeded', 'GatewayTimeout', 'ReadTimeout', 'Timeout'}
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Sent by the background recovery probe, limited to one output token
+PROBE_PROMPT = 'ping'
+
+
+def estimate_tokens(value):
+    """Local token estimate of a prompt or text, at least 1 so every call costs something"""
+    return max(1, local_estimate(value if isinstance(value, str) else repr(value)))
+
+
+def is_retryable(error):
+    """Quota, overload and transient network errors; SDK exceptions are matched by name or status"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+
+def is_timeout(error):
+    if isinstance(error, TimeoutError) or type(error).__name__ in TIMEOUT_ERROR_NAMES:
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in TIMEOUT_STATUS_CODES
+
+
+def is_quota_error(error):
+    """429s: the gateway backs off from them, they don't mean the model is unhealthy"""
+    return type(error).__name__ in QUOTA_ERROR_NAMES or getattr(error, 'code', None) == 429
+
+
+def call_timeout(kwargs):
+    """The ``request_options`` timeout of a generate_content call, or None"""
+    options = kwargs.get('request_options')
+    return options.get('timeout') if isinstance(options, dict) else None
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit breaker is open"""
+
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute, holding at most ``burst_seconds`` worth"""
+
+    def __init__(self, rate_per_minute, burst_seconds=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = self.rate * burst_seconds
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until ``amount`` can be taken and take it; returns seconds spent waiting.
+
+        Requests larger than the bucket wait for a full bucket and leave it
+        in debt, so they still pay for every unit.
+        """
+        needed = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def charge(self, amount):
+        """Take ``amount`` without waiting (usage only known after the call)"""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class CircuitBreaker:
+    """Trips open when ``threshold`` of the last ``window`` calls failed (after at least ``min_calls``).
+
+    While open every call is rejected; recovery is probed from outside with
+    probe_started() / probe_finished(). A successful probe closes the breaker
+    and forgets past outcomes, a failed one keeps it open another ``cooldown``.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, cooldown=DEFAULT_BREAKER_COOLDOWN, window=20,
+                 min_calls=10, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self.clock = clock
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = None
+        self.metrics = {'trips': 0, 'rejected': 0, 'probes': 0}
+        self._lock = threading.Lock()
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            self.metrics['rejected'] += 1
+            return False
+
+    def record(self, succeeded):
+        """Add one call outcome; returns True if this outcome tripped the breaker"""
+        with self._lock:
+            self.outcomes.append(succeeded)
+            if (self.state == CLOSED and self.threshold and len(self.outcomes) >= self.min_calls
+                    and self.error_rate() >= self.threshold):
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.metrics['trips'] += 1
+                return True
+            return False
+
+    def probe_started(self):
+        with self._lock:
+            self.state = HALF_OPEN
+            self.metrics['probes'] += 1
+
+    def probe_finished(self, succeeded):
+        with self._lock:
+            if succeeded:
+                self.state = CLOSED
+                self.outcomes.clear()
+            else:
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def retry_in(self):
+        """Seconds until the next recovery probe"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            return max(0.0, self.opened_at + self.cooldown - self.clock())
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats.update({'state': self.state, 'error_rate': round(self.error_rate(), 3),
+                          'recent_calls': len(self.outcomes)})
+        return stats
+
+
+class LLMGateway:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=1.0, max_delay=30.0, burst_seconds=60.0,
+                 breaker_threshold=DEFAULT_BREAKER_THRESHOLD, breaker_cooldown=DEFAULT_BREAKER_COOLDOWN,
+                 clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.request_bucket = (TokenBucket(requests_per_minute, burst_seconds, clock, sleep)
+                               if requests_per_minute else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute, burst_seconds, clock, sleep)
+                             if tokens_per_minute else None)
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.breakers = {}   # model name -> CircuitBreaker
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'deadline_exceeded': 0,
+            'circuit_rejections': 0,
+            'throttled': 0,
+            'throttle_wait_s': 0.0,
+            'backoff_wait_s': 0.0,
+            'prompt_tokens': 0,
+            'output_tokens': 0,
+            'queue_depth': 0,
+            'max_queue_depth': 0,
+            'in_flight': 0
+        }
+
+    def _record(self, **changes):
+        with self._lock:
+            for name, amount in changes.items():
+                self.metrics[name] += amount
+            self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], self.metrics['queue_depth'])
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for retry number ``attempt`` (0-based)"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _admit(self, prompt_tokens):
+        """Wait for rate budget and a concurrency slot"""
+        self._record(queue_depth=1)
+        try:
+            waited = 0.0
+            if self.request_bucket:
+                waited += self.request_bucket.acquire(1)
+            if self.token_bucket:
+                waited += self.token_bucket.acquire(prompt_tokens)
+            if waited:
+                self._record(throttled=1, throttle_wait_s=waited)
+            if self.slots:
+                self.slots.acquire()
+        finally:
+            self._record(queue_depth=-1)
+        self._record(in_flight=1)
+
+    def _release(self):
+        self._record(in_flight=-1)
+        if self.slots:
+            self.slots.release()
+
+    def _charge_output(self, response):
+        usage = getattr(response, 'usage_metadata', None)
+        tokens = getattr(usage, 'candidates_token_count', None) if usage else None
+        if not tokens:
+            text = response_text(response)
+            tokens = estimate_tokens(text) if text else 0
+        if tokens:
+            self._record(output_tokens=tokens)
+            if self.token_bucket:
+                self.token_bucket.charge(tokens)
+
+    def breaker(self, model):
+        """The circuit breaker of ``model`` (one per model name)"""
+        name = model_identity(model)[0]
+        with self._lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown, clock=self.clock)
+            return self.breakers[name]
+
+    def _check_breaker(self, breaker, model):
+        if not breaker.allow():
+            self._record(circuit_rejections=1)
+            raise CircuitOpenError(f"{model_identity(model)[0]} is failing ({breaker.error_rate():.0%} of recent "
+                                   f"calls); calls are paused, next recovery check in {breaker.retry_in():.0f}s")
+
+    def _record_outcome(self, breaker, model, succeeded):
+        if breaker.record(succeeded):
+            self._schedule_probe(breaker, model)
+
+    def _schedule_probe(self, breaker, model):
+        timer = threading.Timer(breaker.retry_in(), self._probe, (breaker, model))
+        timer.daemon = True
+        timer.start()
+
+    def _probe(self, breaker, model):
+        """Background recovery check of an open breaker: one tiny request, straight to the model"""
+        breaker.probe_started()
+        try:
+            model.generate_content(PROBE_PROMPT, generation_config={'max_output_tokens': 1},
+                                   request_options={'timeout': max(5.0, self.breaker_cooldown)})
+        except Exception:
+            breaker.probe_finished(False)
+            self._schedule_probe(breaker, model)
+        else:
+            breaker.probe_finished(True)
+
+    def generate(self, model, prompt, **kwargs):
+        """``model.generate_content(prompt, **kwargs)`` within the gateway's limits, retrying transient errors.
+
+        A streamed response holds its concurrency slot until it has been
+        consumed; retries only cover starting the call. A ``request_options``
+        timeout is the deadline for the whole call: each attempt gets the
+        time left and no retry would end after it. Server errors and timeouts
+        count against the model's circuit breaker (quota errors don't); while
+        it is open, calls raise CircuitOpenError without reaching the model.
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        breaker = self.breaker(model)
+        timeout = call_timeout(kwargs)
+        deadline = self.clock() + timeout if timeout else None
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(breaker, model)
+            self._admit(prompt_tokens)
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._release()
+                    self._record(deadline_exceeded=1, failures=1)
+                    raise TimeoutError(f"Model call deadline of {timeout:.0f}s passed while waiting for rate limits")
+                kwargs['request_options'] = {**kwargs['request_options'], 'timeout': remaining}
+            self._record(requests=1, prompt_tokens=prompt_tokens)
+            try:
+                response = model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                self._release()
+                if is_timeout(e):
+                    self._record(timeouts=1)
+                if is_retryable(e):
+                    if not is_quota_error(e):
+                        self._record_outcome(breaker, model, False)
+                    delay = self.backoff_delay(attempt)
+                    if deadline is not None and self.clock() + delay >= deadline:
+                        self._record(deadline_exceeded=1, failures=1)
+                        raise
+                    if attempt < self.max_retries:
+                        self._record(retries=1, backoff_wait_s=delay)
+                        self.sleep(delay)
+                        continue
+                self._record(failures=1)
+                raise
+            self._record_outcome(breaker, model, True)
+            if kwargs.get('stream'):
+                return GatedStream(response, self)
+            self._release()
+            self._charge_output(response)
+            return response
+
+    def wrap(self, model):
+        """A drop-in model whose generate_content goes through this gateway"""
+        return ModelWrapper(model, self.generate, 'gateway')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        stats['throttle_wait_s'] = round(stats['throttle_wait_s'], 3)
+        stats['backoff_wait_s'] = round(stats['backoff_wait_s'], 3)
+        stats['max_concurrency'] = self.max_concurrency
+        with self._lock:
+            breakers = dict(self.breakers)
+        stats['breakers'] = {name: breaker.stats() for name, breaker in breakers.items()}
+        return stats
+
+
+class GatedStream:
+    """Streamed response that gives its gateway slot back once consumed or discarded"""
+
+    def __init__(self, response, gateway):
+        self.response = response
+        self.gateway = gateway
+        self.released = False
+
+    def __iter__(self):
+        try:
+            yield from self.response
+        finally:
+            self.release()
+        self.gateway._charge_output(self.response)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.gateway._release()
+
+    def close(self):
+        """Stop reading: give the slot back now rather than when the stream is collected"""
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+llm_gateway = LLMGateway()
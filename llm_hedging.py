@@ -0,0 +1,208 @@
+"""Hedged model calls: a backup request for calls slower than usual.
+
+A call that has not finished after the ``POML_HEDGE_PERCENTILE`` latency of
+recent calls to the same model gets a duplicate, sent to the same model or
+a fallback. The first one to succeed is returned and the other abandoned:
+SDK calls cannot be interrupted, so an abandoned call runs to the end in
+the background, but its stream is closed (giving back its gateway slot)
+and its answer is dropped.
+
+"Finished" means the whole response for unstreamed calls and the first
+chunk for streamed ones, so hedging targets the time to first token there.
+Hedging is off unless ``POML_HEDGE`` is set, waits for
+``POML_HEDGE_MIN_SAMPLES`` latencies per model, and never adds more than
+``POML_HEDGE_MAX_EXTRA`` backup calls per call made.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from llm_cache import ModelWrapper, model_identity
+
+HEDGE_ENABLED = os.getenv('POML_HEDGE', '0').lower() in ('1', 'true', 'yes')
+DEFAULT_PERCENTILE = float(os.getenv('POML_HEDGE_PERCENTILE', '95'))
+DEFAULT_MAX_EXTRA = float(os.getenv('POML_HEDGE_MAX_EXTRA', '0.1'))
+DEFAULT_MIN_SAMPLES = int(os.getenv('POML_HEDGE_MIN_SAMPLES', '20'))
+HEDGE_FALLBACK_MODEL = os.getenv('POML_HEDGE_FALLBACK_MODEL', '')
+
+
+class FirstChunkStream:
+    """A streamed response whose first chunk has already been read"""
+
+    def __init__(self, response, chunks, first):
+        self.response = response
+        self.chunks = chunks
+        self.first = first
+
+    def __iter__(self):
+        if self.first is not None:
+            yield self.first
+        yield from self.chunks
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close:
+            close()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+def finished_call(model, prompt, kwargs):
+    """generate_content, returning once the call has "finished" (its first chunk read, when streamed)"""
+    response = model.generate_content(prompt, **kwargs)
+    if kwargs.get('stream'):
+        chunks = iter(response)
+        response = FirstChunkStream(response, chunks, next(chunks, None))
+    return response
+
+
+def start_call(model, prompt, kwargs):
+    """Run finished_call on its own thread; returns its future"""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(finished_call(model, prompt, kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name='poml-hedge').start()
+    return future
+
+
+def abandon(future):
+    """Drop a losing call: close its stream once it has one"""
+    def close(done):
+        if not done.exception():
+            close_stream = getattr(done.result(), 'close', None)
+            if close_stream:
+                close_stream()
+    future.add_done_callback(close)
+
+
+class Hedger:
+    def __init__(self, enabled=HEDGE_ENABLED, percentile=DEFAULT_PERCENTILE, max_extra=DEFAULT_MAX_EXTRA,
+                 min_samples=DEFAULT_MIN_SAMPLES, window=200, clock=time.monotonic):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_extra = max_extra
+        self.min_samples = min_samples
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._latencies = {}   # (model name, streamed) -> recent latencies
+        self.metrics = {
+            'requests': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'primary_wins': 0,
+            'suppressed': 0,
+            'both_failed': 0
+        }
+
+    def _record(self, **changes):
+        with self._lock:
+            for name, amount in changes.items():
+                self.metrics[name] += amount
+
+    def observe(self, key, seconds):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, key):
+        """The configured percentile of recent latencies for ``key``, or None until there are enough"""
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+
+    def _take_hedge_budget(self):
+        """Count a backup call if the extra-load cap allows one"""
+        with self._lock:
+            if self.metrics['hedged'] + 1 > self.max_extra * self.metrics['requests']:
+                self.metrics['suppressed'] += 1
+                return False
+            self.metrics['hedged'] += 1
+            return True
+
+    def _timed(self, future, key, started):
+        """Record the latency of ``future`` under ``key`` if it succeeds"""
+        def observe(done):
+            if done.exception() is None:
+                self.observe(key, self.clock() - started)
+        future.add_done_callback(observe)
+        return future
+
+    def generate(self, model, prompt, fallback=None, **kwargs):
+        """``model.generate_content(prompt, **kwargs)``, hedged with ``fallback`` (default: ``model``) when slow"""
+        if not self.enabled:
+            return model.generate_content(prompt, **kwargs)
+        self._record(requests=1)
+        key = (model_identity(model)[0], bool(kwargs.get('stream')))
+        delay = self.hedge_delay(key)
+        if delay is None:
+            # No hedge is possible yet, so there is nothing to race: call inline
+            started = self.clock()
+            response = finished_call(model, prompt, kwargs)
+            self.observe(key, self.clock() - started)
+            return response
+        primary = self._timed(start_call(model, prompt, kwargs), key, self.clock())
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge_budget():
+            return primary.result()
+
+        backup_model = fallback or model
+        backup_key = (model_identity(backup_model)[0], key[1])
+        backup = self._timed(start_call(backup_model, prompt, kwargs), backup_key, self.clock())
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        abandon(loser)
+                    self._record(**{'hedge_wins' if future is backup else 'primary_wins': 1})
+                    return future.result()
+        self._record(both_failed=1)
+        return primary.result()
+
+    def wrap(self, model, fallback=None):
+        """A drop-in model whose generate_content is hedged by this Hedger"""
+        return HedgedModel(model, self, fallback)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            keys = list(self._latencies)
+        stats['hedge_rate'] = round(stats['hedged'] / stats['requests'] * 100, 1) if stats['requests'] else 0.0
+        stats['enabled'] = self.enabled
+        delays = {}
+        for name, streamed in keys:
+            delay = self.hedge_delay((name, streamed))
+            if delay is not None:
+                delays[f"{name}{' (first token)' if streamed else ''}"] = round(delay, 3)
+        stats['hedge_after_s'] = delays
+        return stats
+
+
+class HedgedModel(ModelWrapper):
+    """ModelWrapper for a Hedger; its fallback model is prefixed along with the model"""
+
+    def __init__(self, model, hedger, fallback=None):
+        super().__init__(model, functools.partial(hedger.generate, fallback=fallback), 'hedger')
+        self.hedger = hedger
+        self.fallback = fallback
+
+    def cache_prefix(self, prefix, ttl=3600):
+        fallback = self.fallback.cache_prefix(prefix, ttl) if self.fallback else None
+        return HedgedModel(self.model.cache_prefix(prefix, ttl), self.hedger, fallback)
+
+
+# Latencies are pooled across sessions, so hedge delays settle after a few calls
+llm_hedger = Hedger()
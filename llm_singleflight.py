@@ -0,0 +1,224 @@
+"""In-flight request coalescing ("singleflight") for model calls.
+
+When many sessions send the same request at the same time (a workshop all
+opening the default challenge), only the first one reaches the model; the
+others wait for that call and get its response. Requests are the same when
+their model identity, generation arguments and prompt match (the response
+cache key), and streamed and unstreamed calls never share.
+
+A shared streamed response is replayed chunk by chunk to every caller as it
+arrives, so followers stream too. Whichever caller needs the next chunk
+first pulls it from the model, so the call completes as long as anyone is
+still reading it; once every caller has stopped reading, the upstream stream
+is closed (giving back its gateway slot) and the call is forgotten. Nothing
+is kept once a call has finished: this collapses concurrent duplicates only,
+repeats later on are the response cache's job.
+
+A caller never waits on someone else's call for longer than that call's
+``request_options`` timeout, or ``POML_LLM_TIMEOUT`` seconds when it has
+none (0: no limit); past it, it gets a TimeoutError.
+"""
+
+import os
+import threading
+
+from llm_cache import ModelWrapper, request_key
+
+DEFAULT_WAIT_TIMEOUT = float(os.getenv('POML_LLM_TIMEOUT', '120'))
+
+
+class Flight:
+    """One upstream call and everything its callers need to share it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.callers = 1
+        self.readers = 1   # callers that have not finished with a shared stream yet
+
+
+class SharedStream:
+    """Chunks of one streamed response, pulled on demand and kept for every reader"""
+
+    def __init__(self, response, on_finish):
+        self.response = response
+        self.upstream = iter(response)
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.on_finish = on_finish
+        self._lock = threading.Lock()
+
+    def chunk(self, index):
+        """Chunk ``index``, or None once the stream has ended; re-raises a failed stream's error"""
+        with self._lock:
+            while len(self.chunks) <= index and not self.finished:
+                try:
+                    self.chunks.append(next(self.upstream))
+                except StopIteration:
+                    self._finish()
+                except Exception as e:
+                    self.error = e
+                    self._finish()
+            if index < len(self.chunks):
+                return self.chunks[index]
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def _finish(self):
+        self.finished = True
+        self.on_finish()
+
+    def close(self):
+        """Stop an unfinished stream that nobody reads any more"""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        # The response may be its own iterator; close it once
+        for stream in {id(self.upstream): self.upstream, id(self.response): self.response}.values():
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+
+
+class StreamReader:
+    """One caller's view of a SharedStream; replays from the first chunk.
+
+    ``on_close`` runs once, when the reader is exhausted, fails, is closed or
+    is discarded unread.
+    """
+
+    def __init__(self, shared, on_close):
+        self.shared = shared
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        index = 0
+        try:
+            while True:
+                chunk = self.shared.chunk(index)
+                if chunk is None:
+                    return
+                yield chunk
+                index += 1
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.on_close()
+
+    def __del__(self):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.shared.response, name)
+
+
+class SingleFlight:
+    def __init__(self, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights = {}   # request key -> Flight
+        self.metrics = {
+            'requests': 0,
+            'upstream': 0,
+            'collapsed': 0,
+            'in_flight': 0,
+            'max_callers': 0,
+            'wait_timeouts': 0
+        }
+
+    def _join(self, key):
+        """(flight, True if this caller must make the call)"""
+        with self._lock:
+            self.metrics['requests'] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.callers += 1
+                flight.readers += 1
+                self.metrics['collapsed'] += 1
+                self.metrics['max_callers'] = max(self.metrics['max_callers'], flight.callers)
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.metrics['upstream'] += 1
+            self.metrics['in_flight'] += 1
+            return flight, True
+
+    def _land(self, key, flight):
+        """Stop new callers from joining ``flight``"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                self.metrics['in_flight'] -= 1
+
+    def _leave(self, key, flight):
+        """A caller is done with ``flight``'s stream; the last one out closes it"""
+        with self._lock:
+            flight.readers -= 1
+            if flight.readers > 0:
+                return
+            # Nobody can join any more, so the stream is no longer needed
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                self.metrics['in_flight'] -= 1
+        if flight.response is not None:
+            flight.response.close()
+
+    def _reader(self, key, flight):
+        return StreamReader(flight.response, lambda: self._leave(key, flight))
+
+    def generate(self, model, prompt, **kwargs):
+        """``model.generate_content(prompt, **kwargs)``, shared with identical calls already in flight.
+
+        Every caller of a shared call gets the same response object, or the
+        same exception.
+        """
+        key = request_key(model, prompt, **kwargs)
+        flight, leader = self._join(key)
+        if not leader:
+            options = kwargs.get('request_options')
+            timeout = (options.get('timeout') if isinstance(options, dict) else None) or self.wait_timeout
+            if not flight.done.wait(timeout or None):
+                with self._lock:
+                    self.metrics['wait_timeouts'] += 1
+                self._leave(key, flight)
+                raise TimeoutError(f"Identical call in flight gave no response within {timeout:g}s")
+            if flight.error is not None:
+                raise flight.error
+            return self._reader(key, flight) if kwargs.get('stream') else flight.response
+
+        try:
+            response = model.generate_content(prompt, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            self._land(key, flight)
+            flight.done.set()
+            raise
+        if kwargs.get('stream'):
+            # Late callers may still join and replay the stream until it ends
+            flight.response = SharedStream(response, lambda: self._land(key, flight))
+            flight.done.set()
+            return self._reader(key, flight)
+        flight.response = response
+        self._land(key, flight)
+        flight.done.set()
+        return response
+
+    def wrap(self, model):
+        """A drop-in model whose generate_content is coalesced by this SingleFlight"""
+        return ModelWrapper(model, self.generate, 'singleflight')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        stats['collapse_rate'] = round(stats['collapsed'] / stats['requests'] * 100, 1) if stats['requests'] else 0.0
+        return stats
+
+
+llm_singleflight = SingleFlight()
@@ -0,0 +1,187 @@
+"""Model routing: pick a model tier per request from cheap prompt signals.
+
+Signals are the ones the converter already computes: the content domain
+(detect_content_domain), the prompt's estimated tokens, and the answer size
+implied by its output format (one OUTPUT_TOKENS_PER_SECTION per requested
+heading or bullet). Callers may add a ``kind`` label such as 'conversion'.
+
+Rules are data, tried in order; the first rule whose conditions all hold
+picks the tier:
+
+    {"name": "long-answer", "min_output_tokens": 600, "tier": "standard"}
+
+Conditions: ``kind`` and ``domain`` (lists of accepted values) and
+``min_``/``max_`` ``prompt_tokens`` / ``output_tokens``. ``POML_ROUTING_RULES``
+replaces DEFAULT_RULES with a JSON list or the path of a JSON file;
+``POML_ROUTING=0`` sends everything to the standard tier. Tier models come
+from ``POML_MODEL_FAST``, ``POML_MODEL_STANDARD`` and ``POML_MODEL_STRONG``.
+Every decision is logged (logger ``model_router``) and counted.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+
+from poml_core import detect_content_domain
+from token_accounting import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIERS = {
+    'fast': os.getenv('POML_MODEL_FAST', 'gemini-2.5-flash-lite'),
+    'standard': os.getenv('POML_MODEL_STANDARD', 'gemini-2.5-flash'),
+    'strong': os.getenv('POML_MODEL_STRONG', 'gemini-2.5-pro'),
+}
+DEFAULT_TIER = 'standard'
+ROUTING_ENABLED = os.getenv('POML_ROUTING', '1').lower() not in ('0', 'false', 'no', 'off')
+ROUTING_RULES = os.getenv('POML_ROUTING_RULES', '')
+
+# Anything asking for a long or carefully reasoned answer stays on the
+# standard tier; short, simple requests go to the fast one.
+DEFAULT_RULES = [
+    {'name': 'conversion', 'kind': ['conversion'], 'tier': 'fast'},
+    {'name': 'long-answer', 'min_output_tokens': 600, 'tier': 'standard'},
+    {'name': 'long-prompt', 'min_prompt_tokens': 1200, 'tier': 'standard'},
+    {'name': 'reasoning-domain', 'domain': ['technical_algorithms', 'mathematics'], 'tier': 'standard'},
+    {'name': 'simple', 'tier': 'fast'},
+]
+CONDITIONS = ('kind', 'domain', 'min_prompt_tokens', 'max_prompt_tokens', 'min_output_tokens', 'max_output_tokens')
+
+# Rough answer length per requested output section (heading or bullet)
+OUTPUT_TOKENS_PER_SECTION = 150
+OUTPUT_FORMAT = re.compile(r'<output-format\b|output format:', re.IGNORECASE)
+OUTPUT_SECTION = re.compile(r'<h[1-6]\b|<item\b|^[ \t]*(?:#{1,6} |[-*] )', re.IGNORECASE | re.MULTILINE)
+
+
+def load_rules(spec=ROUTING_RULES):
+    """Routing rules from a JSON list, the path of a JSON file, or DEFAULT_RULES when empty"""
+    if not spec:
+        return DEFAULT_RULES
+    if spec.lstrip().startswith('['):
+        rules = json.loads(spec)
+    else:
+        with open(spec, encoding='utf-8') as f:
+            rules = json.load(f)
+    for rule in rules:
+        unknown = set(rule) - set(CONDITIONS) - {'name', 'tier'}
+        if 'tier' not in rule or unknown:
+            raise ValueError(f"Invalid routing rule {rule!r}: needs a tier, unknown keys {sorted(unknown)}")
+    return rules
+
+
+def estimate_output_tokens(prompt):
+    """Answer size implied by the prompt's output format; 0 when it has none"""
+    match = OUTPUT_FORMAT.search(prompt)
+    if not match:
+        return 0
+    return len(OUTPUT_SECTION.findall(prompt, match.end())) * OUTPUT_TOKENS_PER_SECTION
+
+
+def prompt_signals(prompt, kind=None):
+    return {
+        'kind': kind,
+        'domain': detect_content_domain(prompt),
+        'prompt_tokens': estimate_tokens(prompt),
+        'output_tokens': estimate_output_tokens(prompt)
+    }
+
+
+def rule_matches(rule, signals):
+    for condition in ('kind', 'domain'):
+        if condition in rule and signals[condition] not in rule[condition]:
+            return False
+    for signal in ('prompt_tokens', 'output_tokens'):
+        if signals[signal] < rule.get(f'min_{signal}', 0):
+            return False
+        if f'max_{signal}' in rule and signals[signal] > rule[f'max_{signal}']:
+            return False
+    return True
+
+
+class RoutingLog:
+    """Thread-safe decision counts by tier and rule, plus the most recent decisions"""
+
+    def __init__(self, history=200):
+        self._lock = threading.Lock()
+        self.counts = {}   # (tier, rule name) -> decisions
+        self.recent = deque(maxlen=history)
+
+    def record(self, decision):
+        key = (decision['tier'], decision['rule'])
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.recent.append(decision)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        by_tier = {}
+        for (tier, _), decisions in counts.items():
+            by_tier[tier] = by_tier.get(tier, 0) + decisions
+        return {
+            'decisions': sum(counts.values()),
+            'by_tier': by_tier,
+            'by_rule': {f'{tier}:{rule}': decisions for (tier, rule), decisions in sorted(counts.items())}
+        }
+
+
+# Kept here rather than in session state so the counts survive reruns
+routing_log = RoutingLog()
+
+
+class ModelRouter:
+    """Chooses a tier per prompt and hands out one model per tier, made on first use by ``factory(model_name)``.
+
+    Raises ValueError when a rule or the default names a tier that has no model.
+    """
+
+    def __init__(self, factory, tiers=None, rules=None, default_tier=DEFAULT_TIER, enabled=ROUTING_ENABLED,
+                 log=routing_log):
+        self.factory = factory
+        self.tiers = dict(DEFAULT_TIERS if tiers is None else tiers)
+        self.rules = load_rules() if rules is None else rules
+        self.default_tier = default_tier
+        unknown = {rule.get('tier') for rule in self.rules} - set(self.tiers)
+        if default_tier not in self.tiers:
+            unknown.add(default_tier)
+        if unknown:
+            raise ValueError(f"Routing uses unknown tiers {sorted(map(str, unknown))}; "
+                             f"configured tiers are {sorted(self.tiers)}")
+        self.enabled = enabled
+        self.log = log
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def route(self, prompt, kind=None):
+        """{'tier', 'model', 'rule', 'signals'} for one request; logged and counted"""
+        signals = prompt_signals(prompt, kind)
+        tier, rule_name = self.default_tier, 'default'
+        if self.enabled:
+            for rule in self.rules:
+                if rule_matches(rule, signals):
+                    tier, rule_name = rule['tier'], rule.get('name', rule['tier'])
+                    break
+        decision = {'tier': tier, 'model': self.tiers[tier], 'rule': rule_name, 'signals': signals}
+        self.log.record(decision)
+        logger.info("routed %s prompt (%s, %d prompt / ~%d output tokens) to %s by rule %s",
+                    kind or 'a', signals['domain'], signals['prompt_tokens'], signals['output_tokens'],
+                    decision['model'], rule_name)
+        return decision
+
+    def model(self, tier):
+        """The model of ``tier``, created on first use"""
+        with self._lock:
+            if tier not in self._models:
+                self._models[tier] = self.factory(self.tiers[tier])
+            return self._models[tier]
+
+    def model_for(self, prompt, kind=None):
+        """(model, decision) for a prompt"""
+        decision = self.route(prompt, kind)
+        return self.model(decision['tier']), decision
+
+    def stats(self):
+        return {'enabled': self.enabled, **self.log.stats()}
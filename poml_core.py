@@ -0,0 +1,1451 @@
+"""Import-light library core: POML renderer, rule-based converter and response analyzer.
+
+Nothing here imports Streamlit or an LLM SDK, so batch jobs and workers can
+use the renderer and converter without a UI runtime. Calls that need a model
+take it as an argument: any LLM backend (see llm_backends), called through
+generate_response().
+"""
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from functools import cached_property
+
+from constraint_index import ConstraintIndex
+from keyword_index import KeywordIndex
+from llm_cache import response_text
+from poml_parser import Document, parse_poml
+from poml_template import collect_let_variables, compile_text, render_rows
+from rule_engine import RuleSet
+from template_cache import estimate_size, template_cache
+from token_accounting import call_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of a provider-cached prompt prefix
+PREFIX_CACHE_TTL = int(os.getenv('POML_PREFIX_CACHE_TTL', '3600'))
+
+# Per-call limits. POML_LLM_TIMEOUT bounds every wait for output: the whole
+# answer of an unstreamed call (sent to the SDK as its request timeout), and
+# the first chunk and each gap between chunks of a stream (enforced here, so a
+# long answer that keeps streaming is never cut off). A latency budget
+# (seconds) is a total deadline for the call and caps its output at what the
+# expected generation speed fits in it.
+CALL_TIMEOUT = float(os.getenv('POML_LLM_TIMEOUT', '120'))
+LATENCY_BUDGET = float(os.getenv('POML_LLM_LATENCY_BUDGET', '0'))
+EXPECTED_FIRST_TOKEN_SECONDS = float(os.getenv('POML_LLM_EXPECTED_TTFT', '2'))
+EXPECTED_TOKENS_PER_SECOND = float(os.getenv('POML_LLM_EXPECTED_TOKENS_PER_SECOND', '60'))
+MIN_OUTPUT_TOKENS = 256
+
+# POML sections sent to the model, in prompt order
+PROMPT_SECTIONS = [
+    ('role', 'Role'),
+    ('task', 'Task'),
+    ('constraints', 'Constraints'),
+    ('example', 'Example'),
+    ('output-format', 'Output Format'),
+]
+
+# Budgeted rendering: sections with lower priority are trimmed or dropped
+# first; REQUIRED sections are always sent whole.
+REQUIRED = None
+SECTION_PRIORITIES = {
+    'role': REQUIRED,
+    'task': REQUIRED,
+    'output-format': 3,
+    'constraints': 2,
+    'example': 1,
+}
+# Prompt token budget for execute_with_ai (0: send templates whole)
+DEFAULT_TOKEN_BUDGET = int(os.getenv('POML_PROMPT_TOKEN_BUDGET', '0'))
+# A section trimmed below this many tokens is dropped instead
+MIN_TRIMMED_TOKENS = 24
+
+# Render prompts in compact form (see minify_markup) unless a renderer says otherwise
+COMPACT_PROMPTS = os.getenv('POML_COMPACT_PROMPTS', '0').lower() in ('1', 'true', 'yes')
+
+# Left exactly as written by minify_markup: fenced or tagged code, and TeX math
+VERBATIM = re.compile(r'```.*?```|<(pre|code)\b[^>]*>.*?</\1>|\$\$.*?\$\$|\$[^$\n]+\$|\\\(.*?\\\)|\\\[.*?\\\]',
+                      re.DOTALL)
+LIST_TAG = re.compile(r'</?list\b[^>]*>|</item>')
+ITEM_TAG = re.compile(r'<item\b[^>]*>')
+HEADING_TAG = re.compile(r'<h([1-6])\b[^>]*>(.*?)</h\1>', re.DOTALL)
+PARAGRAPH_TAG = re.compile(r'</?p\b[^>]*>')
+
+def call_limits(latency_budget=LATENCY_BUDGET):
+    """generate_content arguments for a latency budget: a total deadline and max output tokens ({} without one)"""
+    if not latency_budget:
+        return {}
+    generating = max(0.0, latency_budget - EXPECTED_FIRST_TOKEN_SECONDS)
+    # Leave a fifth of the generation time as headroom for slower than expected output
+    max_output_tokens = max(MIN_OUTPUT_TOKENS, int(generating * EXPECTED_TOKENS_PER_SECOND * 0.8))
+    return {
+        'request_options': {'timeout': latency_budget},
+        'generation_config': {'max_output_tokens': max_output_tokens}
+    }
+
+class StalledStream:
+    """The text a stream produced before it stalled; stands in for the response, without candidates"""
+    
+    def __init__(self, text):
+        self.text = text
+        self.candidates = []
+
+STREAM_END = object()
+
+def iter_with_deadline(stream, timeout):
+    """Iterate ``stream`` on a helper thread, raising TimeoutError when no chunk arrives for ``timeout`` seconds.
+    
+    SDK streams cannot be interrupted, so a stalled one is left to its thread.
+    When the caller stops early (timed out, or gave up for any other reason)
+    the stream is closed: here if the thread is done with it, else by the
+    thread as soon as it gets control back.
+    """
+    chunks = queue.Queue()
+    stopped = threading.Event()
+    closing = threading.Lock()
+    
+    def close_stream():
+        if closing.acquire(blocking=False):
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+    
+    def pump():
+        try:
+            for chunk in stream:
+                if stopped.is_set():
+                    break
+                chunks.put(chunk)
+            else:
+                chunks.put(STREAM_END)
+        except BaseException as e:
+            chunks.put(e)
+        finally:
+            if stopped.is_set():
+                close_stream()
+    
+    reader = threading.Thread(target=pump, daemon=True, name='poml-stream')
+    reader.start()
+    ended = False
+    try:
+        while True:
+            try:
+                chunk = chunks.get(timeout=timeout or None)
+            except queue.Empty:
+                raise TimeoutError(f"Model stream sent nothing for {timeout:g}s") from None
+            if chunk is STREAM_END:
+                ended = True
+                return
+            if isinstance(chunk, BaseException):
+                ended = True
+                raise chunk
+            yield chunk
+    finally:
+        stopped.set()
+        # A generator cannot be closed while another thread is inside it
+        if not ended and not reader.is_alive():
+            close_stream()
+
+def generate_response(model, prompt, on_text=None, metrics=None, limits=None, timeout=CALL_TIMEOUT):
+    """Call ``model.generate_content(prompt)`` and return the response.
+    
+    With ``on_text`` the response is streamed and ``on_text(text_so_far)`` is
+    called as each chunk arrives; the returned response is the fully consumed
+    stream, so its text and candidates (finish_reason) read as if unstreamed.
+    ``limits`` are extra generate_content arguments (default: call_limits()).
+    ``timeout`` bounds each wait for output: an unstreamed call's answer, or
+    a stream's first chunk and every gap after it. A stream that stalls after
+    producing text returns what it had as a StalledStream (``metrics['stalled']``);
+    one that produces nothing raises TimeoutError.
+    ``metrics``, if given, is filled with timing and token throughput.
+    """
+    limits = call_limits() if limits is None else limits
+    start = time.perf_counter()
+    first_token = None
+    stalled = False
+    if on_text is None:
+        if timeout and 'request_options' not in limits:
+            limits = {**limits, 'request_options': {'timeout': timeout}}
+        response = model.generate_content(prompt, **limits)
+    else:
+        response = model.generate_content(prompt, stream=True, **limits)
+        streamed = ''
+        chunks = iter_with_deadline(response, timeout)
+        try:
+            for chunk in chunks:
+                text = response_text(chunk)
+                if text:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    streamed += text
+                    on_text(streamed)
+        except TimeoutError:
+            if not streamed:
+                raise
+            logger.warning("model stream stalled after %d characters; keeping the partial answer", len(streamed))
+            response = StalledStream(streamed)
+            stalled = True
+        finally:
+            # Stopped reading early (a rerun, a failed callback): let the stream go now, not at collection
+            chunks.close()
+    
+    if metrics is not None:
+        metrics.update(call_metrics(prompt, response, time.perf_counter() - start, first_token, on_text is not None))
+        metrics['deadline_s'] = limits.get('request_options', {}).get('timeout')
+        metrics['idle_timeout_s'] = timeout if on_text is not None else None
+        metrics['stalled'] = stalled
+        metrics['max_output_tokens'] = limits.get('generation_config', {}).get('max_output_tokens')
+    return response
+
+def call_metrics(prompt, response, elapsed, first_token=None, streamed=False):
+    """Latency, token counts and throughput of one model call"""
+    metrics = call_tokens(prompt, response, response_text(response))
+    # Throughput counts generation time only, once the first token has arrived
+    generating = elapsed - first_token if first_token is not None else elapsed
+    metrics.update({
+        'streamed': streamed,
+        'total_s': round(elapsed, 3),
+        'ttft_s': round(first_token if first_token is not None else elapsed, 3),
+        'tokens_per_s': round(metrics['tokens'] / generating, 1) if generating > 0 else 0.0
+    })
+    return metrics
+
+def trim_to_tokens(text, max_tokens):
+    """Longest prefix of ``text`` within ``max_tokens``, cut at a line, else a word, boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    for separator in ('\n', ' '):
+        pieces = text.split(separator)
+        # Binary search for the most pieces that fit; estimates are monotonic in prefix length
+        low, high = 0, len(pieces)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(separator.join(pieces[:middle]) + ' …') <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        if low:
+            return separator.join(pieces[:low]).rstrip() + ' …'
+    return ''
+
+def compact_text(text):
+    """Markup-free, single-spaced form of a prompt fragment with no code or math in it"""
+    text = LIST_TAG.sub('', text)
+    text = ITEM_TAG.sub('\n- ', text)
+    text = HEADING_TAG.sub(lambda match: f"\n{'#' * int(match.group(1))} {match.group(2).strip()}\n", text)
+    text = PARAGRAPH_TAG.sub('\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    # Trim every line and drop blank ones
+    return re.sub(r' ?\n[ \n]*', '\n', text)
+
+def minify_markup(text):
+    """Compact prompt text: list items become "- " bullets, headings "#" lines,
+    paragraphs plain lines, and whitespace is collapsed. Code blocks and math
+    are kept verbatim."""
+    pieces = []
+    position = 0
+    for match in VERBATIM.finditer(text):
+        pieces.append(compact_text(text[position:match.start()]))
+        pieces.append(match.group(0))
+        position = match.end()
+    pieces.append(compact_text(text[position:]))
+    return ''.join(pieces).strip()
+
+class POMLRenderer:
+    def __init__(self, model=None, token_budget=DEFAULT_TOKEN_BUDGET, compact=COMPACT_PROMPTS):
+        self.model = model
+        self.variables = {}
+        self.token_budget = token_budget
+        self.compact = compact
+    
+    def execute_with_ai(self, poml_content, on_text=None, metrics=None):
+        try:
+            if not self.model:
+                return "AI model not available."
+            
+            if self.token_budget:
+                structured_prompt, budget_report = self.render_with_budget(poml_content, self.token_budget)
+                if metrics is not None:
+                    metrics['budget'] = budget_report
+            else:
+                structured_prompt = self.poml_to_prompt(poml_content)
+            response = generate_response(self.model, structured_prompt, on_text, metrics)
+            
+            # Handle different response types and safety filters
+            text = response_text(response)
+            if text:
+                return text
+            elif hasattr(response, 'candidates') and response.candidates:
+                # Try to extract content from candidates
+                for candidate in response.candidates:
+                    if hasattr(candidate, 'content') and candidate.content:
+                        if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                            return candidate.content.parts[0].text
+                    if hasattr(candidate, 'finish_reason'):
+                        if candidate.finish_reason == 1:  # STOP
+                            return "Response completed but no text content available."
+                        elif candidate.finish_reason == 2:  # MAX_TOKENS
+                            return "Response truncated due to length limit."
+                        elif candidate.finish_reason == 3:  # SAFETY
+                            return "Response blocked by safety filters. POML's structured approach may help bypass this."
+                        elif candidate.finish_reason == 4:  # RECITATION
+                            return "Response blocked due to recitation concerns."
+                return "No valid response content available."
+            else:
+                return "Empty response received from AI model."
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    def poml_to_prompt(self, poml_content, variables=None):
+        return self.compile_prompt(poml_content)(variables)
+    
+    def compile_prompt(self, poml_content):
+        """Return a reusable render(variables=None) function for a template.
+        
+        Variables resolve in order: <let> declarations, then self.variables,
+        then the variables passed to render().
+        """
+        template, defaults = self.compiled_template(poml_content)
+        
+        def render(variables=None):
+            return template.render({**defaults, **variables} if variables else defaults)
+        
+        return render
+    
+    def render_with_budget(self, poml_content, budget, variables=None, priorities=None):
+        """Render within ``budget`` estimated tokens; returns (prompt, report).
+        
+        Droppable sections are visited lowest priority first (later sections
+        first on ties). Each is trimmed to the tokens still over budget, or
+        dropped when that would leave less than MIN_TRIMMED_TOKENS, until the
+        prompt fits. ``priorities`` overrides SECTION_PRIORITIES per tag. The
+        report lists every change; ``fits`` is False when the required
+        sections alone exceed the budget.
+        """
+        priorities = {**SECTION_PRIORITIES, **(priorities or {})}
+        compiled = self.compiled(poml_content)
+        defaults = {**compiled['variables'], **self.variables}
+        values = {**defaults, **variables} if variables else defaults
+        parts = [[tag, part.render(values)] for tag, part in compiled['sections']]
+        costs = [estimate_tokens(text) for _, text in parts]
+        # One token of slack per section covers separators and per-section rounding
+        total = sum(costs) + len(costs)
+        removed = []
+        
+        droppable = [i for i, (tag, _) in enumerate(parts) if priorities.get(tag, REQUIRED) is not REQUIRED]
+        droppable.sort(key=lambda i: (priorities[parts[i][0]], -i))
+        for i in droppable:
+            if total <= budget:
+                break
+            keep = costs[i] - (total - budget)
+            trimmed = trim_to_tokens(parts[i][1], keep) if keep >= MIN_TRIMMED_TOKENS else ''
+            action = 'trimmed' if trimmed else 'dropped'
+            saved = costs[i] - estimate_tokens(trimmed)
+            removed.append({'section': parts[i][0], 'action': action, 'tokens_removed': saved})
+            parts[i][1] = trimmed
+            costs[i] -= saved
+            total -= saved
+        
+        prompt = "\n\n".join(text for _, text in parts if text)
+        tokens = estimate_tokens(prompt)
+        report = {
+            'budget': budget,
+            'tokens': tokens,
+            'fits': tokens <= budget,
+            'removed': removed
+        }
+        return prompt, report
+    
+    def render_many(self, poml_content, rows, processes=None, chunksize=256):
+        """Render one template against an iterable of variable rows.
+        
+        The template is parsed once and prompts are yielded lazily in input
+        order. Pass processes > 1 to render chunks of rows on a process pool.
+        """
+        template, defaults = self.compiled_template(poml_content)
+        return render_rows(template, defaults, rows, processes, chunksize)
+    
+    def compiled(self, poml_content):
+        """Cached compile_template() result; compact and full renderings are cached separately"""
+        return template_cache.get_or_compile(poml_content, self.compile_template,
+                                             variant='compact' if self.compact else '')
+    
+    def compiled_template(self, poml_content):
+        """Cached compiled prompt and its default variables"""
+        compiled = self.compiled(poml_content)
+        return compiled['template'], {**compiled['variables'], **self.variables}
+    
+    def compile_template(self, poml_content):
+        """Parse and render a template; returns (compiled, size) for the template cache"""
+        document = parse_poml(poml_content)
+        compiled = {
+            'template': compile_text(self.render_document(document)),
+            'sections': [(tag, compile_text(part)) for tag, part in self.render_sections(document)],
+            'variables': collect_let_variables(document)
+        }
+        return compiled, estimate_size(compiled)
+    
+    def render_document(self, document):
+        return "\n\n".join(part for _, part in self.render_sections(document))
+    
+    def render_sections(self, document):
+        """(tag, "Label: content") for each prompt section present, in prompt order"""
+        prompt_parts = []
+        
+        for tag, label in PROMPT_SECTIONS:
+            section = self.extract_tag_content(document, tag)
+            if section and self.compact:
+                section = minify_markup(section)
+                if section.lower().startswith(label.lower() + ':'):
+                    # Already labelled in the template
+                    prompt_parts.append((tag, section))
+                else:
+                    # Bullets and headings start on their own line
+                    separator = '\n' if section.startswith(('- ', '#')) else ' '
+                    prompt_parts.append((tag, f"{label}:{separator}{section}"))
+            elif section:
+                prompt_parts.append((tag, f"{label}: {section}"))
+        
+        return prompt_parts
+    
+    def section_tokens(self, poml_content, variables=None):
+        """Estimated tokens of each rendered prompt section, {tag: tokens} in prompt order"""
+        compiled = self.compiled(poml_content)
+        defaults = {**compiled['variables'], **self.variables}
+        values = {**defaults, **variables} if variables else defaults
+        return {tag: estimate_tokens(part.render(values)) for tag, part in compiled['sections']}
+    
+    def extract_tag_content(self, content, tag):
+        document = content if isinstance(content, Document) else parse_poml(content)
+        element = document.find(tag)
+        return element.inner_source().strip() if element else None
+
+def execute_plain_text(prompt, model=None, on_text=None, metrics=None):
+    """Execute plain text prompt with better error handling"""
+    try:
+        if not model:
+            return "AI model not available."
+        
+        response = generate_response(model, prompt, on_text, metrics)
+        
+        # Handle different response types and safety filters
+        text = response_text(response)
+        if text:
+            return text
+        elif hasattr(response, 'candidates') and response.candidates:
+            # Try to extract content from candidates
+            for candidate in response.candidates:
+                if hasattr(candidate, 'content') and candidate.content:
+                    if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                        return candidate.content.parts[0].text
+                if hasattr(candidate, 'finish_reason'):
+                    if candidate.finish_reason == 1:  # STOP
+                        return "Response completed but no text content available. This often happens with complex prompts that lack structure."
+                    elif candidate.finish_reason == 2:  # MAX_TOKENS
+                        return "Response truncated due to length limit."
+                    elif candidate.finish_reason == 3:  # SAFETY
+                        return "❌ BLOCKED: Response blocked by safety filters. Plain text prompts are more likely to trigger safety concerns due to ambiguous phrasing."
+                    elif candidate.finish_reason == 4:  # RECITATION
+                        return "❌ BLOCKED: Response blocked due to recitation concerns."
+            return "❌ FAILED: No valid response content available from plain text approach."
+        else:
+            return "❌ FAILED: Empty response received from AI model."
+    except Exception as e:
+        return f"❌ ERROR: {str(e)}"
+
+# Prefixes execute_plain_text and execute_with_ai put on a failed call's message
+ERROR_PREFIXES = ('❌ ERROR', 'Error:', 'AI model not available')
+
+def is_error_response(text):
+    return text.startswith(ERROR_PREFIXES)
+
+def get_olympiad_challenges():
+    return {
+        "💻 Advanced Graph Theory - Minimum Vertex Cover with Constraints": {
+            "description": "Solve a complex computational geometry problem with multiple optimization criteria",
+            "plain_text": "Given a weighted graph G with n vertices (n ≤ 10^5) where each vertex has a color (red, blue, or green) and a weight, find the minimum weighted vertex cover such that: 1) No two adjacent red vertices are both in the cover, 2) At least 60% of blue vertices must be in the cover, 3) The cover must form a connected subgraph, and 4) The total weight is minimized. Provide both the algorithm with complexity analysis and a working implementation.",
+            "poml": '''<poml>
+  <role>Expert competitive programmer and algorithm designer with deep knowledge of graph theory and optimization</role>
+  <task>Design and implement an optimal algorithm for the constrained minimum vertex cover problem</task>
+  <constraints>
+    <list>
+      <item>Graph G with n vertices (n ≤ 10^5)</item>
+      <item>Each vertex: color (red/blue/green) and weight</item>
+      <item>Constraint 1: No two adjacent red vertices in cover</item>
+      <item>Constraint 2: At least 60% of blue vertices in cover</item>
+      <item>Constraint 3: Cover forms connected subgraph</item>
+      <item>Constraint 4: Minimize total weight</item>
+    </list>
+  </constraints>
+  <example>
+    Strong algorithmic solutions include:
+    - Clear problem decomposition and complexity analysis
+    - Efficient data structures (union-find, segment trees, etc.)
+    - Optimization techniques (DP, greedy with proof, approximation)
+    - Edge case handling and correctness proof
+  </example>
+  <output-format>
+    <h3>Problem Analysis</h3>
+    <p>Complexity analysis and approach justification</p>
+    
+    <h3>Algorithm Design</h3>
+    <p>Step-by-step algorithm with pseudocode</p>
+    
+    <h3>Implementation</h3>
+    <p>Complete working code with comments</p>
+    
+    <h3>Complexity Analysis</h3>
+    <p>Time and space complexity with proof</p>
+    
+    <h3>Correctness Proof</h3>
+    <p>Mathematical proof of algorithm correctness</p>
+    
+    <h3>Test Cases</h3>
+    <p>Edge cases and example inputs/outputs</p>
+  </output-format>
+</poml>'''
+        },
+        
+        "🌐 Advanced Dynamic Programming - Optimal Binary Tree Construction": {
+            "description": "Design an optimal algorithm for constructing binary search trees with complex constraints",
+            "plain_text": "Given n keys with access frequencies and a set of 'forbidden pairs' (keys that cannot be in the same subtree), construct an optimal binary search tree that minimizes expected access cost while respecting forbidden constraints. Additionally, the tree must maintain the property that for any node, the sum of frequencies in its left subtree differs from the right subtree by at most k. Provide the DP recurrence, implementation, and prove optimality.",
+            "poml": '''<poml>
+  <role>Expert in advanced algorithms and dynamic programming with specialization in tree structures and optimization</role>
+  <task>Design optimal DP algorithm for constrained binary search tree construction</task>
+  <constraints>
+    <list>
+      <item>n keys with access frequencies</item>
+      <item>Forbidden pairs: certain keys cannot be in same subtree</item>
+      <item>BST property must be maintained</item>
+      <item>Balance constraint: |freq_left - freq_right| ≤ k for all nodes</item>
+      <item>Minimize expected access cost</item>
+      <item>Prove optimality of solution</item>
+    </list>
+  </constraints>
+  <example>
+    Advanced DP solutions require:
+    - State space definition with multiple dimensions
+    - Optimal substructure proof
+    - Recurrence relation derivation
+    - Memoization strategy for efficiency
+    - Reconstruction of optimal solution
+  </example>
+  <output-format>
+    <h3>Problem Formulation</h3>
+    <p>Mathematical model and state space definition</p>
+    
+    <h3>DP Recurrence</h3>
+    <p>Complete recurrence relation with base cases</p>
+    
+    <h3>Algorithm Implementation</h3>
+    <p>Full code with memoization and optimization</p>
+    
+    <h3>Optimality Proof</h3>
+    <p>Mathematical proof of optimal substructure and correctness</p>
+    
+    <h3>Complexity Analysis</h3>
+    <p>Detailed time/space complexity with optimization techniques</p>
+    
+    <h3>Solution Reconstruction</h3>
+    <p>How to build the actual optimal tree from DP table</p>
+  </output-format>
+</poml>'''
+        },
+        
+        "🔢 Number Theory & Cryptography - Advanced Modular Arithmetic": {
+            "description": "Implement efficient algorithms for advanced number-theoretic computations in cryptography",
+            "plain_text": "Implement an efficient algorithm to solve the system: find all integers x such that x ≡ a₁ (mod m₁), x ≡ a₂ (mod m₂), ..., x ≡ aₖ (mod mₖ) where the moduli are not necessarily pairwise coprime, and additionally x must satisfy: x = p^α * q^β * r^γ where p, q, r are distinct primes > 10^6, and α + β + γ = n (given). The solution must handle up to 10^6 congruences efficiently and work for moduli up to 10^18.",
+            "poml": '''<poml>
+  <role>Expert mathematician and cryptographer with deep knowledge of computational number theory and advanced modular arithmetic</role>
+  <task>Design and implement efficient algorithms for solving complex modular systems with additional constraints</task>
+  <constraints>
+    <list>
+      <item>System of k congruences (k ≤ 10^6)</item>
+      <item>Moduli not necessarily pairwise coprime</item>
+      <item>Moduli up to 10^18</item>
+      <item>Additional constraint: x = p^α * q^β * r^γ</item>
+      <item>p, q, r distinct primes > 10^6</item>
+      <item>α + β + γ = n (given)</item>
+      <item>Must be efficient for large inputs</item>
+    </list>
+  </constraints>
+  <example>
+    Advanced number theory solutions include:
+    - Extended Euclidean algorithm for gcd computations
+    - Chinese Remainder Theorem extensions
+    - Prime factorization and primality testing
+    - Modular exponentiation and inverse
+    - Efficient handling of large numbers
+  </example>
+  <output-format>
+    <h3>Mathematical Foundation</h3>
+    <p>Number theory concepts and theorem applications</p>
+    
+    <h3>Algorithm Design</h3>
+    <p>Step-by-step approach with mathematical justification</p>
+    
+    <h3>Efficient Implementation</h3>
+    <p>Optimized code handling large numbers and edge cases</p>
+    
+    <h3>Complexity Analysis</h3>
+    <p>Detailed analysis of time/space complexity</p>
+    
+    <h3>Mathematical Proof</h3>
+    <p>Correctness proof and convergence analysis</p>
+    
+    <h3>Optimization Techniques</h3>
+    <p>Advanced optimizations for handling large-scale inputs</p>
+  </output-format>
+</poml>'''
+        },
+        
+        "🧮 Mathematical Olympiad Problem": {
+            "description": "Solve a complex combinatorics problem with multiple constraints",
+            "plain_text": "Solve this problem: In how many ways can 12 people be arranged in a circle such that exactly 3 specific people are not sitting next to each other, and there are exactly 2 pairs of adjacent people who are wearing the same color shirt (red or blue), given that 7 people wear red shirts and 5 wear blue shirts?",
+            "poml": '''<poml>
+  <role>Expert mathematician specializing in combinatorics and olympiad problem solving</role>
+  <task>Solve the following complex combinatorics problem with step-by-step reasoning</task>
+  <constraints>
+    <list>
+      <item>12 people arranged in a circle</item>
+      <item>Exactly 3 specific people must NOT sit next to each other</item>
+      <item>Exactly 2 pairs of adjacent people wear same color shirts</item>
+      <item>7 people wear red shirts, 5 wear blue shirts</item>
+    </list>
+  </constraints>
+  <example>
+    For simpler problems, break down into:
+    1) Total arrangements without constraints
+    2) Apply each constraint systematically  
+    3) Use inclusion-exclusion principle
+    4) Verify with smaller cases
+  </example>
+  <output-format>
+    <h3>Problem Analysis</h3>
+    <p>Break down the constraints and approach</p>
+    
+    <h3>Step-by-Step Solution</h3>
+    <p>Detailed mathematical reasoning for each step</p>
+    
+    <h3>Calculations</h3>
+    <p>Show all mathematical work with formulas</p>
+    
+    <h3>Final Answer</h3>
+    <p>Clear numerical result with verification</p>
+  </output-format>
+</poml>'''
+        },
+        
+        "🧬 Advanced Chemistry Synthesis": {
+            "description": "Design a multi-step organic synthesis with stereochemistry considerations",
+            "plain_text": "Design a synthesis pathway for (2R,3S)-2,3-dihydroxy-3-phenylpropanoic acid starting from benzaldehyde and any other reagents with up to 3 carbons. The synthesis must maintain stereochemistry throughout and explain the mechanism for each step including transition states.",
+            "poml": '''<poml>
+  <role>Expert organic chemist with deep knowledge of asymmetric synthesis and reaction mechanisms</role>
+  <task>Design a complete stereoselective synthesis pathway with mechanistic details</task>
+  <constraints>
+    <list>
+      <item>Starting material: benzaldehyde only</item>
+      <item>Additional reagents: maximum 3 carbons each</item>
+      <item>Target: (2R,3S)-2,3-dihydroxy-3-phenylpropanoic acid</item>
+      <item>Must maintain stereochemistry throughout</item>
+      <item>Include mechanism and transition states</item>
+    </list>
+  </constraints>
+  <example>
+    Good synthesis design includes:
+    - Retrosynthetic analysis
+    - Stereochemical considerations at each step
+    - Reaction conditions (temperature, solvent, catalysts)
+    - Yield estimates and potential side reactions
+  </example>
+  <output-format>
+    <h3>Retrosynthetic Analysis</h3>
+    <p>Work backwards from target to identify key disconnections</p>
+    
+    <h3>Forward Synthesis</h3>
+    <p>Step-by-step synthesis with reagents and conditions</p>
+    
+    <h3>Stereochemical Control</h3>
+    <p>Explanation of how stereochemistry is established and maintained</p>
+    
+    <h3>Mechanisms</h3>
+    <p>Detailed mechanisms with transition states for each step</p>
+    
+    <h3>Alternative Routes</h3>
+    <p>Discussion of other possible approaches and why this route is optimal</p>
+  </output-format>
+</poml>'''
+        },
+        
+        "🔬 Quantum Physics Challenge": {
+            "description": "Analyze a complex quantum mechanical system with multiple interacting particles",
+            "plain_text": "A system consists of 3 spin-1/2 particles in a 1D infinite square well with width L, where particles 1 and 2 are identical fermions and particle 3 is distinguishable. The particles interact via a contact interaction V₁₂δ(x₁-x₂) + V₁₃δ(x₁-x₃) + V₂₃δ(x₂-x₃). Find the ground state energy and wavefunction, considering both spatial and spin degrees of freedom. Analyze how the energy changes with interaction strength and explain the physical interpretation.",
+            "poml": '''<poml>
+  <role>Theoretical physicist expert in quantum many-body systems and advanced quantum mechanics</role>
+  <task>Solve the quantum many-body problem for 3 interacting particles with mixed statistics</task>
+  <constraints>
+    <list>
+      <item>3 spin-1/2 particles in 1D infinite square well (width L)</item>
+      <item>Particles 1,2: identical fermions; Particle 3: distinguishable</item>
+      <item>Contact interactions: V₁₂δ(x₁-x₂) + V₁₃δ(x₁-x₃) + V₂₃δ(x₂-x₃)</item>
+      <item>Include both spatial and spin wavefunctions</item>
+      <item>Find ground state energy and wavefunction</item>
+      <item>Analyze dependence on interaction strength</item>
+    </list>
+  </constraints>
+  <example>
+    For quantum many-body problems:
+    - Start with non-interacting system
+    - Apply symmetry requirements (fermion antisymmetry)
+    - Use variational or perturbative methods
+    - Consider both strong and weak coupling limits
+  </example>
+  <output-format>
+    <h3>System Setup</h3>
+    <p>Hamiltonian and symmetry requirements</p>
+    
+    <h3>Non-interacting Solution</h3>
+    <p>Base case without interactions</p>
+    
+    <h3>Interacting System Analysis</h3>
+    <p>Treatment of contact interactions with proper wavefunctions</p>
+    
+    <h3>Ground State Solution</h3>
+    <p>Energy eigenvalue and normalized wavefunction</p>
+    
+    <h3>Physical Interpretation</h3>
+    <p>Analysis of interaction effects and limiting behaviors</p>
+    
+    <h3>Numerical/Graphical Analysis</h3>
+    <p>How energy varies with interaction parameters</p>
+  </output-format>
+</poml>'''
+        }
+    }
+
+# Terms whose presence analyze_response scores, scanned in one pass
+RESPONSE_INDEX = KeywordIndex({
+    'structure': ['step', 'analysis', 'solution', 'answer', 'conclusion', '#', '##', '###'],
+    'technical': ['formula', 'equation', 'calculation', 'mechanism', 'analysis', 'theory', 'principle']
+})
+
+def analyze_response(text):
+    """Simple response quality analysis"""
+    words = len(text.split())
+    found = RESPONSE_INDEX.present(text)
+    
+    # Structure score based on headers and organization
+    structure_count = len(found['structure'])
+    structure_score = min(100, structure_count * 8)
+    
+    # Completeness score based on length and detail
+    completeness_score = min(100, words / 10)
+    
+    # Technical depth score
+    technical_count = len(found['technical'])
+    technical_score = min(100, technical_count * 12)
+    
+    return {
+        'words': words,
+        'structure_score': round(structure_score, 1),
+        'completeness_score': round(completeness_score, 1),
+        'technical_score': round(technical_score, 1),
+        'overall_score': round((structure_score + completeness_score + technical_score) / 3, 1)
+    }
+
+SENTENCE_SPLIT = re.compile(r'[.!?]')
+
+# Converter rules: (name, pattern, trigger keywords) per stage. A rule only
+# runs when one of its keywords appears in the sentence; earlier rules win.
+CONVERTER_RULE_DATA = {
+    'role': [
+        ('you_are_start', r'^you are\s+(.+?)(?:\.|,|and|\n)', ['you are']),
+        ('act_as_start', r'^act as\s+(.+?)(?:\.|,|and|\n)', ['act as']),
+        ('as_an_start', r'^as an?\s+(.+?)(?:\.|,|and|\n)', ['as a']),
+        ('you_are', r'you are\s+(.+?)(?:\.|,|and|\n)', ['you are']),
+        ('act_as', r'act as\s+(.+?)(?:\.|,|and|\n)', ['act as'])
+    ],
+    'task_request': [
+        ('polite_request', r'(?:please|can you|could you|would you)\s+(.+?)(?:\.|$)',
+         ['please', 'can you', 'could you', 'would you']),
+        ('help_request', r'(?:help me|assist me with)\s+(.+?)(?:\.|$)', ['help me', 'assist me with']),
+        ('direct_request', r'(?:I need you to|I want you to)\s+(.+?)(?:\.|$)', ['I need you to', 'I want you to'])
+    ],
+    'task_math': [
+        ('find', r'find\s+(.+?)(?:\s+such that|\s+where|\.|$)', ['find']),
+        ('determine', r'determine\s+(.+?)(?:\s+such that|\s+where|\.|$)', ['determine']),
+        ('calculate', r'calculate\s+(.+?)(?:\s+such that|\s+where|\.|$)', ['calculate']),
+        ('solve', r'solve\s+(.+?)(?:\s+such that|\s+where|\.|$)', ['solve']),
+        ('compute', r'compute\s+(.+?)(?:\s+such that|\s+where|\.|$)', ['compute'])
+    ],
+    'task_deliverable': [
+        ('provide', r'provide\s+(.+?)(?:\.|$)', ['provide']),
+        ('give', r'give\s+(.+?)(?:\.|$)', ['give']),
+        ('show', r'show\s+(.+?)(?:\.|$)', ['show']),
+        ('demonstrate', r'demonstrate\s+(.+?)(?:\.|$)', ['demonstrate']),
+        ('explain', r'explain\s+(.+?)(?:\.|$)', ['explain'])
+    ],
+    'task_imperative': [
+        ('imperative_verb', r'^(design|create|build|develop|implement|analyze|evaluate)\s+(.+?)(?:\.|$)',
+         ['design', 'create', 'build', 'develop', 'implement', 'analyze', 'evaluate'])
+    ],
+    'example': [
+        ('example_phrase', r'(?:for example|such as|like|including)\s+(.+?)(?:\.|$)',
+         ['for example', 'such as', 'like', 'including']),
+        ('example_label', r'(?:example|instance):\s*(.+?)(?:\.|$)', ['example', 'instance']),
+        ('eg', r'(?:e\.g\.|eg\.)\s+(.+?)(?:\.|$)', ['e.g.', 'eg.'])
+    ],
+    'hint': [
+        ('note', r'(?:note|remember|keep in mind|consider|pay attention)\s+(?:that\s+)?(.+?)(?:\.|$)',
+         ['note', 'remember', 'keep in mind', 'consider', 'pay attention']),
+        ('hint_label', r'(?:hint|tip|important|crucial)\s*:\s*(.+?)(?:\.|$)',
+         ['hint', 'tip', 'important', 'crucial']),
+        ('make_sure', r'(?:be sure to|make sure to|ensure that)\s+(.+?)(?:\.|$)',
+         ['be sure to', 'make sure to', 'ensure that'])
+    ]
+}
+
+CONVERTER_RULES = {stage: RuleSet(stage, rules) for stage, rules in CONVERTER_RULE_DATA.items()}
+
+def register_converter_rule(stage, rule_name, pattern, keywords=None):
+    """Add a rule to a converter stage (lowest priority within the stage)"""
+    if stage not in CONVERTER_RULES:
+        CONVERTER_RULES[stage] = RuleSet(stage)
+    CONVERTER_RULES[stage].register(rule_name, pattern, keywords)
+
+class AnalyzedText:
+    """Prompt text with derived views computed lazily, once, and shared by every converter stage"""
+    
+    def __init__(self, text):
+        self.text = text
+    
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+    
+    @cached_property
+    def sentences(self):
+        return [s.strip() for s in SENTENCE_SPLIT.split(self.text) if s.strip()]
+    
+    @cached_property
+    def tokens(self):
+        return self.lower.split()
+    
+    @cached_property
+    def domain(self):
+        return classify_domain(self.lower)
+
+def analyze_text(text):
+    """Wrap plain text in an AnalyzedText; already analyzed text is returned as-is"""
+    return text if isinstance(text, AnalyzedText) else AnalyzedText(text)
+
+# Domain indicator terms, in tie-break priority order. Multi-word phrases are
+# stronger evidence than single words, so a term weighs one per word.
+DOMAIN_KEYWORDS = {
+    'technical_algorithms': [
+        'graph', 'vertex', 'algorithm', 'complexity', 'optimization', 'implementation',
+        'binary tree', 'dynamic programming', 'greedy', 'divide and conquer'
+    ],
+    'mathematics': [
+        'theorem', 'proof', 'lemma', 'equation', 'formula', 'mathematical',
+        'modular arithmetic', 'number theory', 'combinatorics'
+    ],
+    'data_science': [
+        'dataset', 'analysis', 'insights', 'visualization', 'machine learning',
+        'statistics', 'correlation', 'regression'
+    ],
+    'software_architecture': [
+        'system design', 'architecture', 'microservices', 'scalability',
+        'distributed', 'api', 'database'
+    ],
+    'business_strategy': [
+        'strategy', 'market', 'revenue', 'roi', 'business plan',
+        'stakeholder', 'competitive analysis'
+    ],
+    'creative': [
+        'story', 'creative', 'writing', 'narrative', 'character',
+        'plot', 'dialogue', 'creative writing'
+    ]
+}
+
+DOMAIN_INDEX = KeywordIndex({
+    domain: {term: len(term.split()) for term in terms}
+    for domain, terms in DOMAIN_KEYWORDS.items()
+})
+
+def convert_to_poml(plain_text, settings):
+    """Production-ready plain text to POML converter following Microsoft specifications"""
+    
+    # Initialize POML components
+    components = {
+        'role': None,
+        'task': None,
+        'constraints': [],
+        'examples': [],
+        'output_format': None,
+        'hints': []
+    }
+    
+    # Clean and prepare text; every stage shares the same analysis
+    text = AnalyzedText(plain_text.strip())
+    
+    # 1. ROLE DETECTION AND ENHANCEMENT
+    components['role'] = detect_and_enhance_role(text, settings)
+    
+    # 2. TASK DETECTION  
+    components['task'] = extract_main_task(text)
+    
+    # 3. CONSTRAINT DETECTION (Production-grade)
+    if settings.get('detailed_constraints', True):
+        components['constraints'] = extract_technical_constraints(text, settings.get('max_constraints', 6))
+    
+    # 4. EXAMPLE DETECTION
+    if settings.get('include_examples', True):
+        components['examples'] = extract_examples(text)
+    
+    # 5. OUTPUT FORMAT DETECTION
+    if settings.get('structured_output', True):
+        components['output_format'] = determine_optimal_output_sections(text, settings)
+    
+    # 6. HINT DETECTION
+    components['hints'] = extract_hints(text)
+    
+    # Generate POML with proper structure
+    return generate_poml_output(components, settings)
+
+def detect_and_enhance_role(text, settings):
+    """Detect role with domain-specific enhancement"""
+    
+    text = analyze_text(text)
+    
+    # Try explicit role patterns first (only in first 100 characters)
+    first_part = text.text[:200].strip()
+    
+    for match in CONVERTER_RULES['role'].matches(first_part):
+        role_text = match.group(1).strip()
+        if len(role_text) < 50:  # Avoid capturing problem descriptions
+            return enhance_role_with_settings(role_text, settings)
+    
+    # Infer role from content domain
+    domain = text.domain
+    base_role = get_domain_expert_role(domain)
+    
+    return enhance_role_with_settings(base_role, settings)
+
+def detect_content_domain(text):
+    """Detect the domain of the content for appropriate role assignment"""
+    
+    return analyze_text(text).domain
+
+def classify_domain(lowered):
+    """Domain of already-lowercased text, by weighted keyword counts"""
+    
+    scores = DOMAIN_INDEX.scores(lowered, lowered=True)
+    best_domain = max(DOMAIN_KEYWORDS, key=lambda domain: scores[domain])  # ties keep list order
+    
+    return best_domain if scores[best_domain] > 0 else 'general'
+
+def get_domain_expert_role(domain):
+    """Get appropriate expert role for detected domain"""
+    
+    domain_roles = {
+        'technical_algorithms': 'algorithm designer and computer scientist',
+        'mathematics': 'mathematician and theoretical researcher', 
+        'data_science': 'data scientist and analytics expert',
+        'software_architecture': 'software architect and system designer',
+        'business_strategy': 'business strategist and analyst',
+        'creative': 'creative writing specialist and storyteller',
+        'general': 'subject matter expert'
+    }
+    
+    return domain_roles.get(domain, 'expert specialist')
+
+def enhance_role_with_settings(base_role, settings):
+    """Apply role enhancement based on user settings"""
+    
+    enhancement = settings.get('role_enhancement', 'Expert level')
+    technical_focus = settings.get('technical_focus', False)
+    
+    # Apply technical focus first
+    if technical_focus and 'expert' not in base_role.lower():
+        base_role = f"expert {base_role}"
+    
+    # Apply enhancement level
+    if enhancement == 'Expert level' and 'expert' not in base_role.lower():
+        enhanced_role = f"Expert {base_role}"
+    elif enhancement == 'Professional' and 'professional' not in base_role.lower():
+        enhanced_role = f"Professional {base_role}"
+    elif enhancement == 'Specialist' and 'specialist' not in base_role.lower():
+        enhanced_role = f"Senior specialist in {base_role.split()[0]}"
+    elif enhancement == 'Consultant':
+        enhanced_role = f"Expert consultant specializing in {base_role.split()[0]}"
+    else:
+        enhanced_role = base_role
+    
+    # Ensure proper capitalization
+    if enhanced_role and enhanced_role[0].islower():
+        enhanced_role = enhanced_role[0].upper() + enhanced_role[1:]
+    
+    return enhanced_role
+
+def extract_main_task(text):
+    """Extract the main task using multiple strategies"""
+    
+    sentences = analyze_text(text).sentences
+    
+    # Strategy 1: Explicit requests
+    for sentence in sentences:
+        match = CONVERTER_RULES['task_request'].first(sentence)
+        if match:
+            return clean_task_text(match.group(1))
+    
+    # Strategy 2: Mathematical problem patterns
+    for sentence in sentences:
+        match = CONVERTER_RULES['task_math'].first(sentence)
+        if match:
+            task_text = clean_task_text(match.group(1))
+            return f"Find {task_text}"
+    
+    # Strategy 3: Deliverable requests (usually in last sentence)
+    if sentences:
+        match = CONVERTER_RULES['task_deliverable'].first(sentences[-1])
+        if match:
+            return f"Provide {clean_task_text(match.group(1))}"
+    
+    # Strategy 4: Imperative verbs at sentence start
+    for sentence in sentences:
+        match = CONVERTER_RULES['task_imperative'].first(sentence)
+        if match:
+            return f"{match.group(1).capitalize()} {clean_task_text(match.group(2))}"
+    
+    return "Solve the given problem comprehensively"
+
+def clean_task_text(task_text):
+    """Clean and optimize task text"""
+    
+    # Remove common endings that should be in constraints
+    task_text = re.sub(r'\s+such that.*$', '', task_text, flags=re.IGNORECASE)
+    task_text = re.sub(r'\s+where.*$', '', task_text, flags=re.IGNORECASE)
+    task_text = re.sub(r'\s+with the following.*$', '', task_text, flags=re.IGNORECASE)
+    
+    # Clean up extra whitespace
+    task_text = re.sub(r'\s+', ' ', task_text).strip()
+    
+    return task_text
+
+def extract_technical_constraints(text, max_constraints=6, key_phrases=True):
+    """Production-grade constraint extraction with mathematical notation support"""
+    
+    constraints = []
+    index = ConstraintIndex(key_phrases=DUPLICATE_KEY_PHRASES if key_phrases else None)
+    
+    for constraint_text in iter_constraint_candidates(analyze_text(text).text):
+        # Near-duplicate check is a constant-time index lookup, not a scan
+        if index.add(constraint_text):
+            constraints.append(constraint_text)
+            if max_constraints and len(constraints) >= max_constraints:
+                break  # Limit to the most important constraints
+    
+    return constraints
+
+def iter_constraint_candidates(text):
+    """Yield cleaned candidate constraints in priority order"""
+    
+    # Pattern 1: Numbered constraints (most common in technical problems)
+    numbered_pattern = r'(\d+)\)\s*([^.]+?)(?=\s*(?:\d+\)|and\s*\d+\)|\.|$))'
+    numbered_matches = re.finditer(numbered_pattern, text, re.IGNORECASE)
+    
+    for match in numbered_matches:
+        constraint_text = match.group(2).strip()
+        
+        # Filter out setup text and keep actual constraints
+        if (len(constraint_text) > 20 and 
+            not any(skip in constraint_text.lower() for skip in [
+                'given a weighted graph', 'where each vertex has', 'find the minimum'
+            ])):
+            
+            # Clean constraint text
+            constraint_text = clean_constraint_text(constraint_text)
+            if constraint_text:
+                yield constraint_text
+    
+    # Pattern 2: "Such that" clauses
+    such_that_pattern = r'such that:\s*(.+?)(?:\.|$)'
+    such_that_match = re.search(such_that_pattern, text, re.IGNORECASE | re.DOTALL)
+    if such_that_match:
+        clause_text = such_that_match.group(1)
+        # Parse individual constraints from the clause
+        yield from parse_constraint_clause(clause_text)
+    
+    # Pattern 3: Explicit constraint keywords
+    constraint_patterns = [
+        r'(?:constraint|requirement|condition)\s*(?:\d+)?\s*[:]\s*([^.]+)',
+        r'(?:must|should|cannot|must not)\s+([^.]+?)(?:\.|,|and|$)',
+        r'(?:ensure|guarantee)\s+(?:that\s+)?([^.]+?)(?:\.|,|and|$)'
+    ]
+    
+    for pattern in constraint_patterns:
+        matches = re.finditer(pattern, text, re.IGNORECASE)
+        for match in matches:
+            constraint_text = clean_constraint_text(match.group(1))
+            if constraint_text and len(constraint_text) > 15:
+                yield constraint_text
+
+# Phrases that mark two similar-length constraints as the same requirement
+DUPLICATE_KEY_PHRASES = ['connected subgraph', 'adjacent red vertices', 'blue vertices', 'total weight']
+
+def clean_constraint_text(constraint_text):
+    """Clean and validate constraint text"""
+    
+    if not constraint_text:
+        return ""
+    
+    # Remove leading/trailing whitespace and punctuation
+    constraint_text = constraint_text.strip().rstrip(',').strip()
+    
+    # Remove incomplete parentheses and brackets
+    if constraint_text.count('(') != constraint_text.count(')'):
+        # Remove incomplete parenthetical expressions
+        constraint_text = re.sub(r'\([^)]*$', '', constraint_text)
+        constraint_text = re.sub(r'^[^(]*\)', '', constraint_text)
+    
+    # Clean up whitespace
+    constraint_text = re.sub(r'\s+', ' ', constraint_text).strip()
+    
+    # Must be substantial enough to be meaningful
+    if len(constraint_text) < 10:
+        return ""
+    
+    # Capitalize first letter
+    if constraint_text:
+        constraint_text = constraint_text[0].upper() + constraint_text[1:]
+    
+    return constraint_text
+
+def parse_constraint_clause(clause_text):
+    """Parse a complex constraint clause into individual constraints"""
+    
+    # Split on common separators
+    separators = [r'\s*,\s*\d+\)\s*', r'\s*and\s*\d+\)\s*', r'\s*,\s*and\s+']
+    
+    constraints = []
+    remaining_text = clause_text
+    
+    for separator in separators:
+        if re.search(separator, remaining_text):
+            parts = re.split(separator, remaining_text)
+            for part in parts:
+                cleaned = clean_constraint_text(part)
+                if cleaned:
+                    constraints.append(cleaned)
+            break
+    
+    if not constraints:
+        # If no separators found, treat as single constraint
+        cleaned = clean_constraint_text(clause_text)
+        if cleaned:
+            constraints.append(cleaned)
+    
+    return constraints
+
+def extract_examples(text):
+    """Extract examples and demonstrations"""
+    
+    examples = []
+    
+    for sentence in analyze_text(text).sentences:
+        for match in CONVERTER_RULES['example'].matches(sentence):
+            example_text = match.group(1).strip()
+            if len(example_text) > 20:  # Substantial examples only
+                examples.append(example_text)
+        if len(examples) >= 2:
+            break
+    
+    return examples[:2]  # Limit to 2 examples
+
+def extract_hints(text):
+    """Extract hints and guidance"""
+    
+    hints = []
+    
+    for sentence in analyze_text(text).sentences:
+        for match in CONVERTER_RULES['hint'].matches(sentence):
+            hint_text = match.group(1).strip()
+            if len(hint_text) > 15:
+                hints.append(hint_text)
+        if len(hints) >= 2:
+            break
+    
+    return hints[:2]  # Limit to 2 hints
+
+def determine_optimal_output_sections(text, settings):
+    """Determine optimal output sections based on content domain and user settings"""
+    
+    # Get user-specified sections first
+    user_sections = settings.get('output_sections', [])
+    if user_sections:
+        return user_sections
+    
+    # Detect domain and provide appropriate sections
+    domain = analyze_text(text).domain
+    
+    domain_sections = {
+        'technical_algorithms': [
+            'Problem Analysis',
+            'Algorithm Design', 
+            'Implementation',
+            'Complexity Analysis',
+            'Correctness Proof'
+        ],
+        'mathematics': [
+            'Mathematical Foundation',
+            'Theorem Application',
+            'Proof Construction',
+            'Solution Verification'
+        ],
+        'data_science': [
+            'Data Analysis',
+            'Statistical Methods',
+            'Insights and Findings',
+            'Recommendations'
+        ],
+        'software_architecture': [
+            'System Architecture',
+            'Component Design',
+            'Implementation Strategy',
+            'Scalability Analysis'
+        ],
+        'business_strategy': [
+            'Executive Summary',
+            'Strategic Analysis',
+            'Recommendations',
+            'Implementation Plan'
+        ],
+        'creative': [
+            'Creative Concept',
+            'Development Process',
+            'Final Output',
+            'Refinement Notes'
+        ],
+        'general': [
+            'Analysis',
+            'Key Findings',
+            'Recommendations'
+        ]
+    }
+    
+    return domain_sections.get(domain, domain_sections['general'])
+
+def generate_poml_output(components, settings):
+    """Generate properly structured POML output"""
+    
+    poml_parts = ['<poml>']
+    
+    # Add role
+    if components['role']:
+        poml_parts.append(f'  <role>{components["role"]}</role>')
+    
+    # Add task
+    if components['task']:
+        poml_parts.append(f'  <task>{components["task"]}</task>')
+    
+    # Add constraints with proper structure
+    if components['constraints']:
+        constraint_grouping = settings.get('constraint_grouping', 'List format')
+        
+        if constraint_grouping == 'Categorized':
+            poml_parts.append('  <constraints>')
+            poml_parts.append('    <h3>Requirements</h3>')
+            poml_parts.append('    <list>')
+            for constraint in components['constraints']:
+                poml_parts.append(f'      <item>{constraint}</item>')
+            poml_parts.append('    </list>')
+            poml_parts.append('  </constraints>')
+        else:  # List format (default)
+            poml_parts.append('  <constraints>')
+            poml_parts.append('    <list>')
+            for constraint in components['constraints']:
+                poml_parts.append(f'      <item>{constraint}</item>')
+            poml_parts.append('    </list>')
+            poml_parts.append('  </constraints>')
+    
+    # Add examples
+    if components['examples']:
+        poml_parts.append('  <example>')
+        for example in components['examples']:
+            poml_parts.append(f'    <exampleinput>Sample scenario: {example}</exampleinput>')
+            poml_parts.append(f'    <exampleoutput>Detailed response following the specified format</exampleoutput>')
+        poml_parts.append('  </example>')
+    
+    # Add hints
+    if components['hints']:
+        for hint in components['hints']:
+            poml_parts.append(f'  <hint>{hint}</hint>')
+    
+    # Add output format
+    if components['output_format']:
+        poml_parts.append('  <output-format>')
+        for section in components['output_format']:
+            poml_parts.append(f'    <h3>{section}</h3>')
+            poml_parts.append(f'    <p>Detailed {section.lower().replace(" ", " ")} with supporting evidence</p>')
+        poml_parts.append('  </output-format>')
+    
+    poml_parts.append('</poml>')
+    
+    return '\n'.join(poml_parts)
+
+# Static part of every LLM conversion request. It is identical for all
+# conversions, so it is sent once as a provider-cached prefix when the backend
+# supports context caching (see with_cached_prefix). At roughly 750 tokens it
+# is below Gemini's 1024-token cache minimum, so today it is sent inline there.
+POML_DOCUMENTATION = """
+# POML (Prompt Orchestration Markup Language) - Complete Documentation
+
+POML is Microsoft's structured prompt engineering framework that uses XML-style markup to create more effective AI interactions.
+
+## Core Structure
+```xml
+<poml>
+  <role>Expert role definition</role>
+  <task>Main objective to accomplish</task>
+  <constraints>
+    <list>
+      <item>Specific requirement 1</item>
+      <item>Specific requirement 2</item>
+    </list>
+  </constraints>
+  <example>
+    <exampleinput>Sample input scenario</exampleinput>
+    <exampleoutput>Expected output format</exampleoutput>
+  </example>
+  <hint>Additional guidance or tips</hint>
+  <output-format>
+    <h3>Section Name</h3>
+    <p>Description of what this section should contain</p>
+  </output-format>
+</poml>
+```
+
+## Tag Specifications
+
+### <role> Tag
+- Defines the AI's expertise and perspective
+- Should be specific and authoritative
+- Examples: "Expert data scientist", "Senior software architect", "Professional business analyst"
+- Enhancement levels: Expert > Professional > Senior > Specialist
+
+### <task> Tag  
+- Clear, actionable main objective
+- Should be concise but comprehensive
+- Focus on the primary deliverable
+- Avoid including constraints here
+
+### <constraints> Tag
+- Always use <list><item> structure for multiple constraints
+- Each constraint should be specific and measurable
+- Include technical requirements, limitations, and conditions
+
+### <example> Tag (Optional)
+- Provides concrete illustrations
+- Use <exampleinput> and <exampleoutput> pairs
+- Should be substantial and meaningful
+- Limit to 1-2 examples maximum
+
+### <hint> Tag (Optional)
+- Additional guidance or context
+- Important considerations or tips
+- Best practices or warnings
+
+### <output-format> Tag
+- Defines expected structure using <h3> and <p> tags
+- Domain-specific sections for Technical/Algorithms: Problem Analysis, Algorithm Design, Implementation, Complexity Analysis, Correctness Proof
+- For Mathematics: Mathematical Foundation, Theorem Application, Proof Construction, Solution Verification
+- For Data Science: Data Analysis, Statistical Methods, Insights and Findings, Recommendations
+- For Business: Executive Summary, Strategic Analysis, Recommendations, Implementation Plan
+
+## Best Practices
+1. Keep roles specific and authoritative
+2. Make tasks clear and actionable
+3. Use numbered constraints for complex problems
+4. Structure output format to match domain needs
+5. Ensure mathematical notation is preserved
+6. Use proper XML formatting
+"""
+
+CONVERSION_PREFIX = (
+    "You are an expert in POML conversion. Convert the plain text prompt given after these "
+    "instructions into properly structured POML format.\n\n"
+    "COMPLETE POML DOCUMENTATION:\n" + POML_DOCUMENTATION + """
+IMPORTANT RULES:
+- Do NOT add any content not present in the original prompt
+- Do NOT modify mathematical notation or technical terms
+- Follow the exact XML structure shown in documentation
+- Ensure no duplicate constraints
+- Use proper capitalization for roles
+- If no explicit examples exist, do not create them
+- Focus on accuracy over creativity
+
+""")
+
+def with_cached_prefix(model, prefix, ttl=PREFIX_CACHE_TTL):
+    """Return (model, inline prefix) for requests that start with ``prefix``.
+    
+    Backends with a ``cache_prefix`` method hold the prefix in the provider's
+    context cache, so only the rest of each request is sent; the inline
+    prefix is then empty. Otherwise the model is returned unchanged and the
+    prefix has to be sent inline, first, where implicit provider caching can
+    still pick it up.
+    """
+    cache_prefix = getattr(model, 'cache_prefix', None)
+    if cache_prefix is not None:
+        try:
+            return cache_prefix(prefix, ttl), ''
+        except Exception as e:
+            # Unsupported model, prefix below the provider minimum, cache quota...
+            logger.info("sending the %d-token prefix inline, context caching unavailable: %s",
+                        estimate_tokens(prefix), e)
+    return model, prefix
+
+def convert_to_poml_with_llm(plain_text: str, settings: dict, model=None, metrics=None) -> str:
+    """Convert plain text to POML using LLM with complete documentation"""
+    
+    if not model:
+        return "Error: AI model not configured"
+    
+    conversion_request = f"""
+USER SETTINGS:
+- Include Examples: {settings.get('include_examples', True)}
+- Detailed Constraints: {settings.get('detailed_constraints', True)}  
+- Structured Output: {settings.get('structured_output', True)}
+- Role Enhancement: {settings.get('role_enhancement', 'Expert level')}
+- Constraint Grouping: {settings.get('constraint_grouping', 'List format')}
+
+PLAIN TEXT PROMPT TO CONVERT:
+{plain_text}
+
+Provide ONLY the final POML output in proper XML format:
+"""
+
+    try:
+        prefixed_model, inline_prefix = with_cached_prefix(model, CONVERSION_PREFIX)
+        response = generate_response(prefixed_model, inline_prefix + conversion_request, metrics=metrics)
+        if metrics is not None:
+            metrics['prefix_cached'] = not inline_prefix
+        
+        text = response_text(response)
+        if text:
+            # Extract just the POML part from the response
+            poml_element = parse_poml(text).find('poml')
+            if poml_element:
+                return poml_element.outer_source()
+            else:
+                return text.strip()
+        else:
+            return "Error: Could not generate POML conversion"
+            
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -0,0 +1,235 @@
+"""Single-pass POML parser and AST.
+
+The parser walks the source once with one compiled tag pattern and builds
+the tree on a stack, so a document is scanned exactly once no matter how many
+sections are read from it afterwards. Every element keeps the source offsets
+of its body, which lets callers recover the raw inner markup (e.g. the
+``<list><item>`` block inside ``<constraints>``) without rescanning.
+
+Building the whole tree costs more than a regex search for a handful of tags:
+on a single multi-megabyte template ``benchmarks/bench_parser.py`` shows it
+about twice as slow as the legacy per-tag regex scans. Rendering pays that
+once per template (compiled templates are cached), and every section, inner
+markup and ``<let>`` lookup afterwards is free.
+"""
+
+import gc
+import re
+
+# One pattern for every tag: </name attr="v" ...> or <name ... />. Attribute
+# values may be quoted (and then contain '>'), unquoted or left out.
+TAG_PATTERN = re.compile(
+    r'<(/?)([A-Za-z][\w\-.:]*)((?:\s(?:"[^"]*"|\'[^\']*\'|[^<>"\'])*?|\s[^<>]*?)?)\s*(/?)>')
+ATTR_PATTERN = re.compile(r'([A-Za-z_][\w\-.:]*)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'=<>`]+)))?')
+
+# Tags POML defines. Any other tag that is never closed is taken to be prose
+# ("x<y and y>0") and kept as text rather than reported as unclosed.
+POML_TAGS = frozenset([
+    'poml', 'role', 'task', 'constraints', 'example', 'examples', 'exampleinput', 'exampleoutput',
+    'hint', 'output-format', 'output-schema', 'stepwise-instructions', 'introducer', 'let', 'include',
+    'document', 'section', 'list', 'item', 'p', 'b', 'i', 'u', 's', 'span', 'br', 'code', 'pre',
+    'table', 'img', 'cp', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+])
+
+
+class Text:
+    """A run of character data; the value is sliced from the source on demand"""
+    __slots__ = ('source', 'start', 'end')
+
+    def __init__(self, source, start, end):
+        self.source = source
+        self.start = start
+        self.end = end
+
+    @property
+    def value(self):
+        return self.source[self.start:self.end]
+
+    def __repr__(self):
+        return f"Text({self.value!r})"
+
+
+class Element:
+    __slots__ = ('tag', 'attrs', 'children', 'start', 'end', 'inner_start', 'inner_end', 'source')
+
+    def __init__(self, tag, attrs, source, start, end):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.source = source
+        self.start = start              # offset of '<' of the opening tag
+        self.end = end                  # offset just past the closing tag
+        self.inner_start = end          # offset just past the opening tag
+        self.inner_end = end            # offset of '<' of the closing tag
+
+    def __repr__(self):
+        return f"Element({self.tag!r}, {self.attrs!r}, children={len(self.children)})"
+
+    def inner_source(self):
+        """Raw markup between the opening and closing tag"""
+        return self.source[self.inner_start:self.inner_end]
+
+    def outer_source(self):
+        """Raw markup including the element's own tags"""
+        return self.source[self.start:self.end]
+
+    def text_content(self):
+        """Concatenated text of this element and all descendants, tags removed"""
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Text):
+                parts.append(node.value)
+            else:
+                stack.extend(reversed(node.children))
+        return ''.join(parts)
+
+    def iter(self, tag=None):
+        """Yield descendant elements in document order, optionally filtered by tag"""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Element):
+                if tag is None or node.tag == tag:
+                    yield node
+                stack.extend(reversed(node.children))
+
+    def find(self, tag):
+        """First descendant element with the given tag, or None"""
+        return next(self.iter(tag), None)
+
+
+class Document(Element):
+    __slots__ = ('index', 'errors')
+
+    def __init__(self, source):
+        super().__init__('#document', {}, source, 0, len(source))
+        self.inner_start = 0
+        self.index = {}
+        self.errors = []
+
+    def find(self, tag):
+        # The parser indexes elements by tag in document order, so lookups
+        # on the root never walk the tree
+        elements = self.index.get(tag)
+        return elements[0] if elements else None
+
+    def find_all(self, tag):
+        return list(self.index.get(tag, ()))
+
+
+def parse_attributes(raw):
+    """Parse name="value", name=value and bare name attributes from the inside of a tag"""
+    if not raw or raw.isspace():
+        return {}
+    attrs = {}
+    for m in ATTR_PATTERN.finditer(raw):
+        value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+        attrs[m.group(1)] = '' if value is None else value
+    return attrs
+
+
+def close_unclosed(stack, index, errors, end):
+    """Pop the innermost open element, which was never closed, ending it at ``end``.
+
+    POML elements are closed implicitly and reported; anything else is turned
+    back into text: its opening tag becomes a text node and its children move
+    up to its parent.
+    """
+    unclosed = stack.pop()
+    if unclosed.tag in POML_TAGS:
+        unclosed.inner_end = unclosed.end = end
+        errors.append(f"Unclosed tag <{unclosed.tag}> at offset {unclosed.start}")
+        return
+    # Still open, so it is the last child of its parent
+    stack[-1].children[-1:] = [Text(unclosed.source, unclosed.start, unclosed.inner_start)] + unclosed.children
+    elements = index[unclosed.tag]
+    elements.remove(unclosed)
+    if not elements:
+        del index[unclosed.tag]
+
+
+def parse_poml(source):
+    """Build a Document tree from POML source in O(n).
+
+    Malformed markup never raises: a closing tag without a matching opener is
+    kept as text, and POML elements left open are closed implicitly by their
+    parent or at the end of the document. Both cases are recorded in
+    ``errors``. Other tags that are never closed are kept as text.
+    """
+    # The tree is all new objects that cannot form cycles; collection passes
+    # while it grows only cost time (and more of it the larger the document)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_document(source)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def build_document(source):
+    document = Document(source)
+    stack = [document]
+    children = document.children
+    index = document.index
+    errors = document.errors
+    position = 0
+
+    # This loop is the hot path for large templates
+    for match in TAG_PATTERN.finditer(source):
+        start, end = match.span()
+        if start > position:
+            children.append(Text(source, position, start))
+        position = end
+
+        closing, tag, raw_attrs, self_closing = match.groups()
+        tag = tag.lower()
+
+        if not closing:
+            element = Element(tag, parse_attributes(raw_attrs), source, start, end)
+            children.append(element)
+            if tag in index:
+                index[tag].append(element)
+            else:
+                index[tag] = [element]
+            if not self_closing:
+                stack.append(element)
+                children = element.children
+            continue
+
+        # Find the nearest open element with this tag; anything opened
+        # after it is closed implicitly
+        depth = len(stack) - 1
+        while depth > 0 and stack[depth].tag != tag:
+            depth -= 1
+        if depth == 0:
+            errors.append(f"Unexpected closing tag </{tag}> at offset {start}")
+            children.append(Text(source, start, end))
+            continue
+        while len(stack) - 1 > depth:
+            close_unclosed(stack, index, errors, start)
+        element = stack.pop()
+        element.inner_end = start
+        element.end = end
+        children = stack[-1].children
+
+    if position < len(source):
+        children.append(Text(source, position, len(source)))
+
+    while len(stack) > 1:
+        close_unclosed(stack, index, errors, len(source))
+
+    return document
+
+
+def validate_poml(source):
+    """Return a list of structural problems found in a POML document"""
+    document = source if isinstance(source, Document) else parse_poml(source)
+    issues = list(document.errors)
+    if document.find('poml') is None:
+        issues.append("Missing <poml> root element")
+    if document.find('task') is None:
+        issues.append("Missing <task> element")
+    return issues
@@ -0,0 +1,146 @@
+"""Variable interpolation for POML templates.
+
+``{{name}}`` placeholders are located once, when a template is compiled, and
+turned into a positional ``str.format`` string. Rendering a compiled template
+against a new set of variables is then a single C-level format call with no
+rescanning of the text.
+"""
+
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*([A-Za-z_][\w.]*)\s*\}\}')
+
+
+class CompiledText:
+    """Text with ``{{name}}`` placeholders, pre-split for fast rendering"""
+    __slots__ = ('text', 'format_string', 'names', 'placeholders')
+
+    def __init__(self, text):
+        self.text = text
+        self.names = []
+        self.placeholders = []
+        parts = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            parts.append(escape_braces(text[position:match.start()]))
+            parts.append('{%d}' % len(self.names))
+            self.names.append(match.group(1))
+            self.placeholders.append(match.group(0))
+            position = match.end()
+        parts.append(escape_braces(text[position:]))
+        self.format_string = ''.join(parts)
+
+    def render(self, variables):
+        if not self.names:
+            return self.text
+        try:
+            values = [variables[name] for name in self.names]
+        except KeyError:
+            # Dotted or undefined names take the slower lookup
+            values = [resolve_variable(variables, name, placeholder)
+                      for name, placeholder in zip(self.names, self.placeholders)]
+        return self.format_string.format(*values)
+
+
+def escape_braces(text):
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def resolve_variable(variables, name, placeholder):
+    """Look up ``name`` (dotted names walk nested dicts); unknown names render unchanged"""
+    if name in variables:
+        return variables[name]
+    value = variables
+    for part in name.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return placeholder
+    return value
+
+
+def compile_text(text):
+    return CompiledText(text)
+
+
+def collect_let_variables(document):
+    """Variables declared with <let name="..." value="..."/> or <let name="...">value</let>.
+
+    Later declarations override earlier ones, and a value may reference
+    variables declared before it.
+    """
+    variables = {}
+    for element in document.find_all('let'):
+        name = element.attrs.get('name')
+        if not name:
+            continue
+        value = element.attrs.get('value')
+        if value is None:
+            value = element.inner_source().strip()
+        variables[name] = CompiledText(value).render(variables)
+    return variables
+
+
+def render_rows(template, defaults, rows, processes=None, chunksize=256):
+    """Lazily render ``template`` for each row of variables, preserving order.
+
+    With ``processes`` > 1 rows are rendered in chunks on a process pool. At
+    most two chunks per worker are in flight at a time, so memory stays flat
+    however large ``rows`` is.
+    """
+    if not processes or processes <= 1:
+        for row in rows:
+            yield template.render({**defaults, **row} if row else defaults)
+        return
+
+    for rendered in map_chunks(_render_chunk, rows, chunksize, processes, _init_render_worker, (template, defaults)):
+        yield from rendered
+
+
+def map_chunks(function, iterable, chunksize, processes, initializer=None, initargs=()):
+    """Lazily yield ``function(chunk)`` for each chunk of ``iterable``, in order, on a process pool.
+
+    At most two chunks per worker are in flight at a time, so memory stays
+    flat however long ``iterable`` is.
+    """
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        try:
+            for chunk in iter_chunks(iterable, chunksize):
+                pending.append(executor.submit(function, chunk))
+                if len(pending) >= processes * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Consumer stopped early: drop work that has not started yet
+            for future in pending:
+                future.cancel()
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Per-process state for render_rows workers, set once by the pool initializer
+_worker_template = None
+_worker_defaults = None
+
+
+def _init_render_worker(template, defaults):
+    global _worker_template, _worker_defaults
+    _worker_template = template
+    _worker_defaults = defaults
+
+
+def _render_chunk(rows):
+    return [_worker_template.render({**_worker_defaults, **row} if row else _worker_defaults)
+            for row in rows]
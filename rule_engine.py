@@ -0,0 +1,59 @@
+"""Registrable regex rule sets for the rule-based converter.
+
+Each rule is data: a name, a pattern and the literal trigger keywords the
+pattern cannot match without. A RuleSet precompiles its patterns and, per
+text, casefolds once and only runs the rules whose keywords are present.
+Most sentences trigger no rule of a stage at all, so they cost a few C-level
+substring checks instead of one regex search per pattern. Rules keep their
+priority order, and a rule's match is exactly what ``re.search`` with that
+pattern alone returns.
+"""
+
+import re
+
+
+class Rule:
+    __slots__ = ('name', 'pattern', 'keywords', 'regex')
+
+    def __init__(self, name, pattern, keywords=None, flags=re.IGNORECASE):
+        self.name = name
+        self.pattern = pattern
+        # Keywords are compared against casefolded text; None means always run
+        self.keywords = tuple(k.casefold() for k in keywords) if keywords else None
+        self.regex = re.compile(pattern, flags)
+
+    def triggered_by(self, folded):
+        return self.keywords is None or any(keyword in folded for keyword in self.keywords)
+
+
+class RuleSet:
+    def __init__(self, name, rules=(), flags=re.IGNORECASE):
+        self.name = name
+        self.flags = flags
+        self.rules = []
+        for rule in rules:
+            self.register(*rule)
+
+    def register(self, rule_name, pattern, keywords=None):
+        """Append a rule; it has lower priority than the rules before it"""
+        self.rules.append(Rule(rule_name, pattern, keywords, self.flags))
+
+    def search(self, text):
+        """(rule, match or None) for every rule, in priority order"""
+        folded = text.casefold()
+        return [(rule, rule.regex.search(text) if rule.triggered_by(folded) else None)
+                for rule in self.rules]
+
+    def matches(self, text):
+        """Matches of every matching rule, in priority order"""
+        return [match for _, match in self.search(text) if match]
+
+    def first(self, text):
+        """Match of the highest-priority matching rule, or None"""
+        folded = text.casefold()
+        for rule in self.rules:
+            if rule.triggered_by(folded):
+                match = rule.regex.search(text)
+                if match:
+                    return match
+        return None
@@ -0,0 +1,196 @@
+"""Headless experiment runner: every Olympiad challenge x approach x model x trial.
+
+Each cell sends one challenge to one model, as plain text or as POML, and
+records the analyze_response metrics and call timings as one JSONL row. Rows
+are appended (and flushed) as cells finish, so the results file doubles as a
+checkpoint: rerunning the same command skips cells that already succeeded and
+retries the rest. Rows for cells outside the current plan (another trial
+count, model or challenge filter) are left in the file but not reported.
+Every trial is its own model call, so trials are independent samples.
+
+    python run_experiments.py -o results.jsonl --models gemini-2.5-flash,gemini-2.5-pro --trials 5
+    POML_LLM_BACKEND=fake python run_experiments.py -o results.jsonl --trials 20 --csv summary.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from llm_backends import DEFAULT_BACKEND, DEFAULT_GEMINI_MODEL, create_backend
+from llm_gateway import llm_gateway
+from poml_core import POMLRenderer, analyze_response, execute_plain_text, get_olympiad_challenges, is_error_response
+
+APPROACHES = ('plain', 'poml')
+SCORES = ('words', 'structure_score', 'completeness_score', 'technical_score', 'overall_score')
+
+
+def cell_id(challenge, approach, model_name, trial):
+    return f"{challenge}|{approach}|{model_name}|{trial}"
+
+
+def call_key(model_name, prompt, trial):
+    """Cells with the same key send the same request in the same trial (e.g. two challenges with one text)"""
+    digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).hexdigest()
+    return f"{model_name}|{digest}|{trial}"
+
+
+def load_checkpoint(path):
+    """Rows already in the results file, by cell id; a torn last line is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' not in row:
+                done[row['cell']] = row
+    return done
+
+
+def plan_cells(challenges, model_names, trials):
+    """(cell id, challenge name, approach, model name, trial, prompt) for every cell"""
+    renderer = POMLRenderer()
+    for name, challenge in challenges.items():
+        prompts = {'plain': challenge['plain_text'], 'poml': renderer.poml_to_prompt(challenge['poml'])}
+        for model_name in model_names:
+            for trial in range(trials):
+                for approach in APPROACHES:
+                    yield (cell_id(name, approach, model_name, trial), name, approach, model_name, trial,
+                           prompts[approach])
+
+
+def run_call(model, approach, source):
+    """One model call; returns (response text, call metrics)"""
+    metrics = {}
+    if approach == 'plain':
+        text = execute_plain_text(source, model, metrics=metrics)
+    else:
+        text = POMLRenderer(model).execute_with_ai(source, metrics=metrics)
+    return text, metrics
+
+
+def result_row(cell, challenge, approach, model_name, trial, text, metrics):
+    row = {'cell': cell, 'challenge': challenge, 'approach': approach, 'model': model_name, 'trial': trial}
+    if is_error_response(text):
+        row['error'] = text
+        return row
+    row.update(analyze_response(text))
+    row.update({name: metrics.get(name) for name in ('total_s', 'ttft_s', 'prompt_tokens', 'cached_tokens',
+                                                     'tokens', 'tokens_estimated', 'tokens_per_s')})
+    return row
+
+
+def run_experiments(challenges, models, trials, results_path, workers=4):
+    """Run every pending cell, appending rows to ``results_path``; returns the successful rows of planned cells"""
+    plan = list(plan_cells(challenges, list(models), trials))
+    planned = {cell for cell, *_ in plan}
+    done = {cell: row for cell, row in load_checkpoint(results_path).items() if cell in planned}
+    pending = {}   # call key -> [cells waiting on that call]
+    sources = {}   # call key -> (model name, approach, source text)
+    for cell, name, approach, model_name, trial, prompt in plan:
+        if cell in done:
+            continue
+        key = call_key(model_name, prompt, trial)
+        pending.setdefault(key, []).append((cell, name, approach, model_name, trial))
+        source = challenges[name]['plain_text'] if approach == 'plain' else challenges[name]['poml']
+        sources.setdefault(key, (model_name, approach, source))
+
+    cells = sum(len(waiting) for waiting in pending.values())
+    print(f"{len(done)} cells done, {cells} pending as {len(pending)} distinct calls", file=sys.stderr)
+
+    with open(results_path, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_call, models[model_name], approach, source): key
+                   for key, (model_name, approach, source) in sources.items()}
+        for completed, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            try:
+                text, metrics = future.result()
+            except Exception as e:
+                text, metrics = f"Error: {type(e).__name__}: {e}", {}
+            for cell, name, approach, model_name, trial in pending[key]:
+                row = result_row(cell, name, approach, model_name, trial, text, metrics)
+                out.write(json.dumps(row, ensure_ascii=False) + '\n')
+                if 'error' not in row:
+                    done[cell] = row
+            out.flush()
+            if completed % 10 == 0 or completed == len(futures):
+                print(f"{completed}/{len(futures)} calls finished", file=sys.stderr)
+    return list(done.values())
+
+
+def summarize(rows):
+    """Mean scores per (challenge, model, approach)"""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row['challenge'], row['model'], row['approach']), []).append(row)
+    summary = []
+    for (challenge, model_name, approach), group in sorted(groups.items()):
+        entry = {'challenge': challenge, 'model': model_name, 'approach': approach, 'trials': len(group)}
+        for score in SCORES + ('total_s', 'ttft_s', 'prompt_tokens', 'tokens'):
+            values = [row[score] for row in group if row.get(score) is not None]
+            entry[f'mean_{score}'] = round(sum(values) / len(values), 2) if values else None
+        summary.append(entry)
+    return summary
+
+
+def write_csv(path, rows):
+    if not rows:
+        return
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run every Olympiad challenge as plain text and POML across models and trials.")
+    parser.add_argument('-o', '--output', default='experiment_results.jsonl', help="Results JSONL (also the checkpoint)")
+    parser.add_argument('--models', default=DEFAULT_GEMINI_MODEL, help="Comma-separated model names")
+    parser.add_argument('--trials', type=int, default=3, help="Samples per challenge, approach and model")
+    parser.add_argument('--challenges', default='', help="Only challenges whose name contains one of these comma-separated words")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent model calls")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=['gemini', 'fake'])
+    parser.add_argument('--csv', help="Also write mean scores per challenge, model and approach to this CSV")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    challenges = get_olympiad_challenges()
+    if args.challenges:
+        words = [word.strip().lower() for word in args.challenges.split(',') if word.strip()]
+        challenges = {name: c for name, c in challenges.items() if any(word in name.lower() for word in words)}
+
+    models = {}
+    for model_name in [name.strip() for name in args.models.split(',') if name.strip()]:
+        if args.backend == 'gemini':
+            backend = create_backend('gemini', model_name=model_name, api_key=os.getenv('GOOGLE_API_KEY'))
+        else:
+            backend = create_backend('fake', model_name=model_name, seed=model_name)
+        models[model_name] = llm_gateway.wrap(backend)
+
+    start = time.perf_counter()
+    rows = run_experiments(challenges, models, args.trials, args.output, args.workers)
+    summary = summarize(rows)
+    if args.csv:
+        write_csv(args.csv, summary)
+
+    for entry in summary:
+        print(f"{entry['approach']:>6} {entry['model'][:24]:<24} n={entry['trials']:<3} "
+              f"overall={entry['mean_overall_score']!s:>6}  {entry['challenge']}")
+    expected = len(challenges) * len(models) * args.trials * len(APPROACHES)
+    print(json.dumps({'cells': expected, 'succeeded': len(rows), 'elapsed_s': round(time.perf_counter() - start, 1),
+                      'gateway': llm_gateway.stats()}), file=sys.stderr)
+    return 0 if len(rows) == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
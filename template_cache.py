@@ -0,0 +1,119 @@
+"""Process-wide, content-addressed cache for compiled POML templates.
+
+Streamlit re-executes the app script on every interaction, but imported
+modules stay loaded for the life of the server process, so a cache held here
+is shared by every rerun and every session.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('POML_TEMPLATE_CACHE_SIZE', '256'))
+DEFAULT_MAX_BYTES = int(os.getenv('POML_TEMPLATE_CACHE_BYTES', str(32 * 1024 * 1024)))
+
+
+def source_digest(source, variant=''):
+    """Content address of a template; ``variant`` separates render modes"""
+    digest = hashlib.blake2b(source.encode('utf-8'), digest_size=16)
+    if variant:
+        digest.update(b'\0' + variant.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def estimate_size(*values):
+    """Approximate bytes retained by an entry: its strings, containers and slotted objects, walked recursively"""
+    size = 0
+    seen = set()
+    stack = list(values)
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, '__slots__'):
+            stack.extend(getattr(value, name) for name in value.__slots__ if hasattr(value, name))
+    return size
+
+
+class TemplateCache:
+    """Thread-safe LRU cache bounded by entry count and approximate bytes"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compile(self, source, compile_fn, variant=''):
+        """Return the cached value for ``source`` or build it with ``compile_fn``.
+
+        ``compile_fn(source)`` must return ``(value, size)``. Compilation runs
+        outside the lock, so two sessions missing on the same template at once
+        may both compile it; the second result simply replaces the first.
+        """
+        key = source_digest(source, variant)
+        value = self.get(key)
+        if value is None:
+            value, size = compile_fn(source)
+            self.put(key, value, size)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0
+            }
+
+
+# Shared by every POMLRenderer in the process
+template_cache = TemplateCache()
@@ -0,0 +1,95 @@
+"""Shared streams in llm_singleflight: the upstream is closed once, after its last reader leaves.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_singleflight import SingleFlight
+
+
+class Upstream:
+    """A streamed response that is its own iterator and counts close() calls"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.closed = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.closed += 1
+
+
+class StreamingModel:
+    model_name = 'test-model'
+
+    def __init__(self, chunks=('a', 'b', 'c', 'd')):
+        self.chunks = chunks
+        self.streams = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.streams.append(Upstream(self.chunks))
+        return self.streams[-1]
+
+
+def two_readers():
+    singleflight = SingleFlight()
+    model = StreamingModel()
+    leader = iter(singleflight.generate(model, 'prompt', stream=True))
+    follower = iter(singleflight.generate(model, 'prompt', stream=True))
+    return singleflight, model, leader, follower
+
+
+def test_followers_share_one_upstream_call():
+    singleflight, model, leader, follower = two_readers()
+    assert len(model.streams) == 1
+    assert singleflight.stats()['collapsed'] == 1
+    assert list(leader) == list(follower) == ['a', 'b', 'c', 'd']
+
+
+def test_upstream_closed_once_after_last_reader_leaves():
+    singleflight, model, leader, follower = two_readers()
+    upstream = model.streams[0]
+    assert next(leader) == 'a'
+    assert next(follower) == 'a'
+
+    leader.close()
+    assert upstream.closed == 0
+    assert singleflight.stats()['in_flight'] == 1
+    assert next(follower) == 'b'
+
+    follower.close()
+    assert upstream.closed == 1
+    assert singleflight.stats()['in_flight'] == 0
+
+    # A new identical request starts a fresh call instead of joining the closed one
+    assert list(singleflight.generate(model, 'prompt', stream=True)) == ['a', 'b', 'c', 'd']
+    assert len(model.streams) == 2
+    assert upstream.closed == 1
+
+
+def test_follower_finishes_after_leader_abandons():
+    singleflight, model, leader, follower = two_readers()
+    assert next(leader) == 'a'
+    del leader
+    assert list(follower) == ['a', 'b', 'c', 'd']
+    assert model.streams[0].closed == 0
+    assert singleflight.stats()['in_flight'] == 0
+
+
+def test_reader_discarded_unread_releases_the_call():
+    singleflight = SingleFlight()
+    model = StreamingModel()
+    reader = singleflight.generate(model, 'prompt', stream=True)
+    reader.close()
+    assert model.streams[0].closed == 1
+    assert singleflight.stats()['in_flight'] == 0
@@ -0,0 +1,87 @@
+"""Token accounting for prompts and model calls.
+
+Counts come from a response's ``usage_metadata`` when the backend reports it
+and from a fast local estimate otherwise. A TokenLedger aggregates calls by
+any label (session, challenge, approach...) so expensive templates stand out.
+"""
+
+import re
+import threading
+
+# Words, numbers and individual symbols: roughly one BPE token each
+WORD_OR_SYMBOL = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text):
+    """Local token estimate: the larger of ~4 characters per token and one token per word or symbol"""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+    return max(len(text) // 4, len(WORD_OR_SYMBOL.findall(text)))
+
+
+def call_tokens(prompt, response, response_text=None):
+    """{'prompt_tokens', 'cached_tokens', 'tokens', 'tokens_estimated'} for one call.
+
+    ``tokens`` is the output count. Usage metadata wins; any count it lacks
+    is estimated from ``prompt`` or ``response_text`` and flagged.
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) if usage else None
+    output_tokens = getattr(usage, 'candidates_token_count', None) if usage else None
+    cached_tokens = (getattr(usage, 'cached_content_token_count', None) if usage else None) or 0
+    estimated = not prompt_tokens or not output_tokens
+    if not prompt_tokens:
+        prompt_tokens = estimate_tokens(prompt)
+    if not output_tokens:
+        output_tokens = estimate_tokens(response_text)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'cached_tokens': cached_tokens,
+        'tokens': output_tokens,
+        'tokens_estimated': estimated
+    }
+
+
+def empty_totals():
+    return {'calls': 0, 'input_tokens': 0, 'output_tokens': 0, 'cached_tokens': 0, 'total_tokens': 0}
+
+
+class TokenLedger:
+    """Thread-safe running token totals, overall and per label value (memory grows with distinct labels only)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.overall = empty_totals()
+        self.groups = {}   # label name -> {label value: totals}
+
+    def record(self, metrics, **labels):
+        """Add one call's token metrics (as produced by call_tokens) under ``labels``"""
+        if not metrics or 'prompt_tokens' not in metrics:
+            return
+        prompt_tokens = metrics['prompt_tokens'] or 0
+        output_tokens = metrics['tokens'] or 0
+        cached_tokens = metrics.get('cached_tokens') or 0
+        with self._lock:
+            targets = [self.overall]
+            for name, value in labels.items():
+                targets.append(self.groups.setdefault(name, {}).setdefault(value, empty_totals()))
+            for total in targets:
+                total['calls'] += 1
+                total['input_tokens'] += prompt_tokens
+                total['output_tokens'] += output_tokens
+                total['cached_tokens'] += cached_tokens
+                total['total_tokens'] += prompt_tokens + output_tokens
+
+    def totals(self, by=None):
+        """Overall totals, or {label value: totals} for label ``by``, most tokens first"""
+        with self._lock:
+            if not by:
+                return dict(self.overall)
+            groups = {value: dict(total) for value, total in self.groups.get(by, {}).items()}
+        return dict(sorted(groups.items(), key=lambda item: item[1]['total_tokens'], reverse=True))
+
+
+# Process-wide ledger behind the app's Token Usage panel
+token_ledger = TokenLedger()